@@ -0,0 +1,191 @@
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+import requests
+
+# Categorias de falha usadas para decidir se e quando uma tarefa é repetida
+FALHA_REDE = "rede"
+FALHA_JSON = "json"
+FALHA_API = "api"
+FALHA_PDF = "pdf"
+FALHA_SEM_PDF = "sem_pdf"
+FALHA_COTA = "cota"  # Orçamento de consultas esgotado: a consulta nem chegou a ser feita
+FALHA_DESCONHECIDA = "desconhecida"
+
+# Códigos da Infosimples que indicam erro de autenticação ou de parâmetros:
+# repetir a consulta não muda o resultado e só gera custo
+CODIGOS_API_DEFINITIVOS = frozenset({601, 602, 603, 606, 607, 608})
+
+
+class FalhaConsulta(Exception):
+    """Falha classificada de uma etapa da consulta (API ou download do PDF)."""
+
+    def __init__(self, categoria: str, mensagem: str, codigo: int = None):
+        super().__init__(mensagem)
+        self.categoria = categoria
+        self.codigo = codigo
+
+
+def classificar_falha(erro: Exception) -> str:
+    """Retorna a categoria de uma exceção levantada por uma etapa da consulta."""
+    if isinstance(erro, FalhaConsulta):
+        return erro.categoria
+    # JSONDecodeError do requests também é RequestException, por isso é verificado antes
+    if isinstance(erro, (json.JSONDecodeError, requests.exceptions.JSONDecodeError)):
+        return FALHA_JSON
+    if isinstance(erro, requests.exceptions.RequestException):
+        return FALHA_REDE
+    return FALHA_DESCONHECIDA
+
+
+class PoliticaRetentativa():
+    """
+    Define quantas vezes, com qual espera e com qual preferência de emissão uma tarefa é repetida.
+
+    A espera cresce exponencialmente com a tentativa, limitada por `atraso_maximo`, e
+    metade dela é aleatória (jitter) para que várias falhas simultâneas não voltem juntas.
+    Falhas 6xx/7xx da Infosimples costumam ser instabilidades do site da Receita e
+    partem de uma espera maior.
+    """
+
+    ATRASOS_BASE = {
+        FALHA_REDE: 2.0,
+        FALHA_JSON: 2.0,
+        FALHA_API: 10.0,
+        FALHA_PDF: 2.0,
+        FALHA_SEM_PDF: 2.0,
+        FALHA_DESCONHECIDA: 2.0,
+    }
+
+    def __init__(self, max_tentativas: int = 3, atraso_maximo: float = 300.0,
+                 preferencias: tuple = ("nova", "2via"), atrasos_base: dict = None,
+                 codigos_definitivos: frozenset = CODIGOS_API_DEFINITIVOS):
+        self.max_tentativas = max_tentativas
+        self.atraso_maximo = atraso_maximo
+        self.preferencias = preferencias
+        self.atrasos_base = {**self.ATRASOS_BASE, **(atrasos_base or {})}
+        self.codigos_definitivos = codigos_definitivos
+
+    def preferencia(self, tentativa: int) -> str:
+        """Alterna a preferência de emissão ("nova", "2via", ...) a cada tentativa."""
+        return self.preferencias[tentativa % len(self.preferencias)]
+
+    def retentavel(self, erro: Exception) -> bool:
+        categoria = classificar_falha(erro)
+        # Sem 'site_receipt' a repetição alterna a preferência de emissão ("nova"/"2via")
+        if categoria == FALHA_COTA:
+            return False
+        if categoria == FALHA_API and getattr(erro, "codigo", None) in self.codigos_definitivos:
+            return False
+        return True
+
+    def atraso(self, tentativa: int, erro: Exception) -> float:
+        """Espera, em segundos, antes da próxima tentativa (tentativa começa em 0)."""
+        base = self.atrasos_base.get(classificar_falha(erro), self.atrasos_base[FALHA_DESCONHECIDA])
+        teto = min(self.atraso_maximo, base * (2 ** tentativa))
+        return teto / 2 + random.uniform(0, teto / 2)
+
+
+class AgendadorRetentativas():
+    """
+    Reagenda tarefas que falharam sem bloquear os workers.
+
+    As tarefas ficam em uma fila de prioridade ordenada pelo horário da próxima
+    tentativa; uma thread em segundo plano as devolve à fila de trabalho quando
+    chega a hora, enquanto os CNPJs novos continuam sendo processados.
+
+    Tarefas que esgotam as tentativas por falhas transitórias são guardadas para
+    uma varredura final, feita depois que todo o restante terminou.
+    """
+
+    def __init__(self, politica: PoliticaRetentativa = None):
+        self.politica = politica or PoliticaRetentativa()
+        self._agendadas = []
+        self._sequencia = itertools.count()
+        self._para_varredura = []
+        self._condicao = threading.Condition()
+        self._ativo = False
+        self._thread = None
+
+    def iniciar(self):
+        with self._condicao:
+            if self._ativo:
+                return
+            self._ativo = True
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        with self._condicao:
+            self._ativo = False
+            self._condicao.notify_all()
+        if self._thread:
+            self._thread.join()
+
+    def agendar(self, tarefa, tentativa: int, erro: Exception, reenfileirar) -> bool:
+        """
+        Reagenda a tarefa, se a política permitir.
+
+        Parâmetros:
+            tarefa: Tarefa que falhou.
+            tentativa (int): Número da tentativa que falhou (começa em 0).
+            erro (Exception): Erro levantado pela tentativa.
+            reenfileirar (callable): `reenfileirar(tarefa, tentativa)` devolve a tarefa à fila de trabalho.
+
+        Retorna:
+            bool: True se a tarefa ainda será executada (retentativa ou varredura final).
+        """
+        categoria = classificar_falha(erro)
+        if not self.politica.retentavel(erro):
+            print(f"Falha definitiva ({categoria}) para {tarefa}: {erro}")
+            return False
+
+        if tentativa >= self.politica.max_tentativas:
+            print(f"Falha ({categoria}) na varredura final para {tarefa}: {erro}")
+            return False
+
+        proxima = tentativa + 1
+        with self._condicao:
+            if proxima >= self.politica.max_tentativas:
+                print(f"Tentativas esgotadas ({categoria}) para {tarefa}; reservado para a varredura final.")
+                self._para_varredura.append((tarefa, proxima, reenfileirar))
+                return True
+
+            atraso = self.politica.atraso(tentativa, erro)
+            print(f"Falha ({categoria}) para {tarefa}: {erro}. Nova tentativa em {atraso:.1f} s.")
+            heapq.heappush(self._agendadas, (time.monotonic() + atraso, next(self._sequencia), tarefa, proxima, reenfileirar))
+            self._condicao.notify_all()
+        return True
+
+    def reservadas_varredura(self) -> int:
+        """Quantidade de tarefas aguardando a varredura final."""
+        with self._condicao:
+            return len(self._para_varredura)
+
+    def varredura_final(self) -> int:
+        """
+        Devolve à fila, uma última vez, as tarefas que esgotaram as tentativas.
+
+        Retorna:
+            int: Quantidade de tarefas reenfileiradas.
+        """
+        with self._condicao:
+            pendentes, self._para_varredura = self._para_varredura, []
+        for tarefa, tentativa, reenfileirar in pendentes:
+            reenfileirar(tarefa, tentativa)
+        return len(pendentes)
+
+    def _executar(self):
+        while True:
+            with self._condicao:
+                while self._ativo and (not self._agendadas or self._agendadas[0][0] > time.monotonic()):
+                    espera = self._agendadas[0][0] - time.monotonic() if self._agendadas else None
+                    self._condicao.wait(espera)
+                if not self._ativo:
+                    return
+                _, _, tarefa, tentativa, reenfileirar = heapq.heappop(self._agendadas)
+            # Fora do lock: a fila de destino pode estar cheia e bloquear
+            reenfileirar(tarefa, tentativa)
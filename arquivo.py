@@ -1,15 +1,84 @@
+import numpy as np
 import pandas as pd
 import os
+import re
+import sqlite3
 import datetime
 
 
-def localizar_arquivo_excel(base_path: str) -> str:
+# Índice das pastas já listadas: caminho -> (mtime da pasta, entradas).
+# Uma pasta só é listada novamente no drive quando a sua data de modificação muda.
+_indice_pastas = {}
+
+
+def _listar_pasta(caminho: str) -> list:
+    """
+    Lista as entradas de uma pasta com os.scandir, reaproveitando o índice em memória.
+
+    Retorna:
+        list: Tuplas (nome, é_diretório) ordenadas pelo nome.
+    """
+    mtime = os.stat(caminho).st_mtime_ns
+    cache = _indice_pastas.get(caminho)
+    if cache is not None and cache[0] == mtime:
+        return cache[1]
+
+    with os.scandir(caminho) as entradas:
+        conteudo = sorted((entrada.name, entrada.is_dir()) for entrada in entradas)
+    _indice_pastas[caminho] = (mtime, conteudo)
+    return conteudo
+
+
+def _data_da_subpasta(nome: str):
+    """Converte o nome da subpasta ('DD.MM.AAAA' ou 'DD MM AAAA') em data, ou None se não for uma data."""
+    for formato_data in ["%d.%m.%Y", "%d %m %Y"]:
+        try:
+            return datetime.datetime.strptime(nome, formato_data)
+        except ValueError:
+            continue  # Tentar o próximo formato
+    return None
+
+
+def indexar_planilhas_controle(caminho_mes: str) -> dict:
+    """
+    Mapeia as segundas-feiras de uma pasta de mês para a planilha de controle correspondente.
+
+    Parâmetros:
+        caminho_mes (str): Pasta do mês (ex.: '.../2024/2024-11').
+
+    Retorna:
+        dict: {data da subpasta: caminho do arquivo Excel}. Segundas-feiras sem planilha não entram.
+    """
+    indice = {}
+    for subpasta, eh_diretorio in _listar_pasta(caminho_mes):
+        data_subpasta = _data_da_subpasta(subpasta) if eh_diretorio else None
+
+        # Apenas subpastas com data de segunda-feira
+        if data_subpasta is None or data_subpasta.weekday() != 0:
+            continue
+
+        subpasta_path = os.path.join(caminho_mes, subpasta)
+        arquivos = [arquivo for arquivo, eh_dir in _listar_pasta(subpasta_path)
+                    if not eh_dir and "PLANILHA DE CONTROLE" in arquivo and arquivo.endswith(".xlsx")]
+        if arquivos:
+            # Várias planilhas na mesma pasta: a de maior nome, para uma escolha determinística
+            indice[data_subpasta] = os.path.join(subpasta_path, arquivos[-1])
+        else:
+            print(f"Arquivo Excel esperado, mas não encontrado em: {subpasta_path}")
+    return indice
+
+
+def localizar_arquivo_excel(base_path: str, data_referencia: datetime.datetime = None) -> str:
     """
     Localiza o arquivo Excel em uma estrutura de pastas organizada por ano/mês.
     Lida com subpastas nos formatos 'DD.MM.AAAA' e 'DD MM AAAA'.
 
+    Escolhe a planilha da segunda-feira mais recente do mês corrente; se o mês
+    ainda não tiver nenhuma, procura no mês anterior.
+
     Parâmetros:
         base_path (str): Caminho base onde estão as pastas de arquivos Excel.
+        data_referencia (datetime): Data usada para definir o mês corrente (padrão: agora).
 
     Retorna:
         str: Caminho completo do arquivo Excel encontrado.
@@ -17,56 +86,121 @@ def localizar_arquivo_excel(base_path: str) -> str:
     Lança:
         FileNotFoundError: Se o arquivo ou as pastas esperadas não forem encontradas.
     """
-    # Obter o ano e mês corrente
-    ano_atual = datetime.datetime.now().year
-    mes_atual = datetime.datetime.now().month
-    mes_atual_str = f"{mes_atual:02d}"  # Para garantir que o mês tenha 2 dígitos
-
-    # Caminho da pasta do ano corrente
-    caminho_ano = os.path.join(base_path, str(ano_atual), f"{ano_atual}-{mes_atual_str}")
-    print(f"Procurando na pasta do ano/mês: {caminho_ano}")  # Log para depuração
-
-    # Verificar se a pasta do mês existe
-    if not os.path.exists(caminho_ano):
-        raise FileNotFoundError(f"A pasta para o ano e mês corrente não foi encontrada: {caminho_ano}")
-
-    # Procurar pelas subpastas dentro dessa pasta
-    for subpasta in os.listdir(caminho_ano):
-        subpasta_path = os.path.join(caminho_ano, subpasta)
-        print(f"Verificando subpasta: {subpasta_path}")  # Log para depuração
-
-        # Verificar se a subpasta corresponde a um dos formatos esperados de data
-        data_subpasta = None
-        for formato_data in ["%d.%m.%Y", "%d %m %Y"]:
-            try:
-                data_subpasta = datetime.datetime.strptime(subpasta, formato_data)
-                break  # Se o formato é válido, sair do loop
-            except ValueError:
-                continue  # Tentar o próximo formato
-
-        # Se a subpasta não corresponder a nenhum formato de data, ignorá-la
-        if data_subpasta is None:
-            print(f"Subpasta ignorada (formato inválido): {subpasta}")
-            continue
+    data_referencia = data_referencia or datetime.datetime.now()
+    mes_anterior = data_referencia.replace(day=1) - datetime.timedelta(days=1)
 
-        # Verifica se é uma segunda-feira
-        if data_subpasta.weekday() == 0:  # Segunda-feira
-            # Buscar arquivos que contenham "PLANILHA DE CONTROLE"
-            for arquivo in os.listdir(subpasta_path):
-                if "PLANILHA DE CONTROLE" in arquivo and arquivo.endswith(".xlsx"):
-                    arquivo_excel_path = os.path.join(subpasta_path, arquivo)
-                    print(f"Arquivo Excel encontrado: {arquivo_excel_path}")
-                    return arquivo_excel_path
+    pastas_verificadas = []
+    for data_mes in (data_referencia, mes_anterior):
+        # Caminho da pasta do ano/mês
+        caminho_mes = os.path.join(base_path, str(data_mes.year), f"{data_mes.year}-{data_mes.month:02d}")
+        pastas_verificadas.append(caminho_mes)
+        print(f"Procurando na pasta do ano/mês: {caminho_mes}")  # Log para depuração
 
-            print(f"Arquivo Excel esperado, mas não encontrado em: {subpasta_path}")
+        if not os.path.isdir(caminho_mes):
+            print(f"A pasta para o ano e mês não foi encontrada: {caminho_mes}")
+            continue
+
+        indice = indexar_planilhas_controle(caminho_mes)
+        if indice:
+            arquivo_excel_path = indice[max(indice)]
+            print(f"Arquivo Excel encontrado: {arquivo_excel_path}")
+            return arquivo_excel_path
 
     # Caso o arquivo não seja encontrado
-    raise FileNotFoundError(f"Não foi encontrado o arquivo Excel no caminho esperado: {caminho_ano}")
+    raise FileNotFoundError(f"Não foi encontrado o arquivo Excel nos caminhos esperados: {pastas_verificadas}")
+
+
+# Pesos dos dígitos verificadores do CNPJ (o segundo considera também o primeiro dígito verificador)
+PESOS_DV1_CNPJ = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+PESOS_DV2_CNPJ = np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+
+# Motivos de rejeição de um CNPJ da planilha
+MOTIVO_TAMANHO = "tamanho"
+MOTIVO_CARACTERES = "caracteres"
+MOTIVO_REPETIDO = "digitos_repetidos"
+MOTIVO_DIGITO_VERIFICADOR = "digito_verificador"
+
+# CNPJ dentro de um texto (ex.: nome de pasta): 12 caracteres alfanuméricos e 2 dígitos verificadores,
+# com ou sem a pontuação usual, sem estar colado a outras letras ou números
+PADRAO_CNPJ_EM_TEXTO = re.compile(
+    r'(?<![0-9A-Z])[0-9A-Z]{2}\.?[0-9A-Z]{3}\.?[0-9A-Z]{3}[/-]?[0-9A-Z]{4}-?[0-9]{2}(?![0-9A-Z])')
+
+# Relatório das linhas da planilha de controle com CNPJ inválido
+CAMINHO_RELATORIO_CNPJS_REJEITADOS = os.path.join(os.path.expanduser("~"), ".consultacnd", "cnpjs_rejeitados.csv")
+
+
+def normalizar_cnpj(cnpj) -> str:
+    """
+    Normaliza um CNPJ: sem pontuação, maiúsculo e com 14 caracteres (zeros à esquerda).
+
+    Números vindos do Excel (ex.: 1234567000195.0) perdem a parte decimal. Letras são
+    mantidas, para o CNPJ alfanumérico.
+    """
+    if isinstance(cnpj, (int, float, np.integer, np.floating)) and not isinstance(cnpj, bool):
+        cnpj = str(int(cnpj))
+    return re.sub(r'[^0-9A-Z]', '', str(cnpj).upper()).zfill(14)
+
+
+def extrair_cnpj(texto: str):
+    """
+    Localiza um CNPJ (numérico ou alfanumérico) em um texto como "EMPRESA X 12.345.678-0001-95".
+
+    Retorna:
+        str: O CNPJ normalizado (ver normalizar_cnpj), ou None se o texto não contém um CNPJ.
+    """
+    encontrado = PADRAO_CNPJ_EM_TEXTO.search(str(texto).upper())
+    return normalizar_cnpj(encontrado.group()) if encontrado else None
+
+
+def motivos_cnpjs_invalidos(cnpjs) -> np.ndarray:
+    """
+    Valida uma coluna inteira de CNPJs já normalizados de uma só vez, com NumPy.
+
+    Aceita o formato numérico e o alfanumérico (12 primeiros caracteres de 0-9 ou A-Z,
+    valendo o código ASCII menos 48, e 2 dígitos verificadores numéricos). Os dígitos
+    verificadores de todas as linhas são calculados como produtos de matrizes.
+
+    Parâmetros:
+        cnpjs (iterable): CNPJs normalizados (ver normalizar_cnpj).
+
+    Retorna:
+        np.ndarray: Motivo de rejeição de cada CNPJ, ou None para os válidos.
+    """
+    cnpjs = np.asarray(list(cnpjs), dtype=str)
+    motivos = np.full(len(cnpjs), None, dtype=object)
+    if len(cnpjs) == 0:
+        return motivos
+
+    tamanho_ok = np.char.str_len(cnpjs) == 14
+    motivos[~tamanho_ok] = MOTIVO_TAMANHO
+
+    # Matriz de códigos Unicode (uma linha por CNPJ, uma coluna por caractere)
+    indices = np.flatnonzero(tamanho_ok)
+    matriz = cnpjs[indices].astype("<U14").view(np.uint32).reshape(-1, 14).astype(np.int64)
+    base = matriz[:, :12]
+    dvs = matriz[:, 12:]
+    caracteres_ok = (((base >= ord('0')) & (base <= ord('9'))) | ((base >= ord('A')) & (base <= ord('Z')))).all(axis=1)
+    caracteres_ok &= ((dvs >= ord('0')) & (dvs <= ord('9'))).all(axis=1)
+
+    valores = matriz - ord('0')
+    resto1 = (valores[:, :12] @ PESOS_DV1_CNPJ) % 11
+    dv1 = np.where(resto1 < 2, 0, 11 - resto1)
+    resto2 = (valores[:, :12] @ PESOS_DV2_CNPJ[:12] + dv1 * PESOS_DV2_CNPJ[12]) % 11
+    dv2 = np.where(resto2 < 2, 0, 11 - resto2)
+    dv_ok = (valores[:, 12] == dv1) & (valores[:, 13] == dv2)
+
+    # "00000000000000", "11111111111111"... passam no cálculo, mas não são CNPJs
+    repetido = (matriz == matriz[:, :1]).all(axis=1)
+
+    motivos[indices[~dv_ok]] = MOTIVO_DIGITO_VERIFICADOR
+    motivos[indices[repetido]] = MOTIVO_REPETIDO
+    motivos[indices[~caracteres_ok]] = MOTIVO_CARACTERES
+    return motivos
 
 
 def filtrar_cnpjs_validos(cnpjs):
     """
-    Filtra os CNPJs para garantir que sejam válidos (apenas números, com 14 caracteres).
+    Filtra os CNPJs para garantir que sejam válidos (14 caracteres e dígitos verificadores corretos).
     
     Parâmetros:
         cnpjs (list): Lista de CNPJs em formato de string.
@@ -74,52 +208,157 @@ def filtrar_cnpjs_validos(cnpjs):
     Retorno:
         list: Lista com CNPJs válidos.
     """
-    return [cnpj for cnpj in cnpjs if len(cnpj) == 14 and cnpj.isdigit()]
+    cnpjs = list(cnpjs)
+    motivos = motivos_cnpjs_invalidos(cnpjs)
+    return [cnpj for cnpj, motivo in zip(cnpjs, motivos) if motivo is None]
+
+
+def separar_cnpjs_invalidos(df_aba: pd.DataFrame, nome_aba: str, linha_cabecalho: int) -> tuple:
+    """
+    Separa as linhas de uma aba com CNPJ inválido.
+
+    Retorna:
+        tuple: (linhas válidas, linhas rejeitadas com as colunas aba, linha do Excel, CNPJ, EMPRESA e motivo).
+    """
+    motivos = motivos_cnpjs_invalidos(df_aba['CNPJ'])
+    invalidos = pd.notna(motivos)
+    df_rejeitados = df_aba[invalidos].assign(
+        aba=nome_aba,
+        linha=df_aba.index[invalidos] + linha_cabecalho + 2,  # Linha do Excel (1 = primeira linha da aba)
+        motivo=motivos[invalidos],
+    )[['aba', 'linha', 'CNPJ', 'EMPRESA', 'motivo']]
+    return df_aba[~invalidos], df_rejeitados
 
 
-def ler_planilhas_e_extrair_cnpjs(arquivo_excel: str, sheet1_header: int = 2, sheet2_header: int = 1) -> pd.DataFrame:
+def _salvar_relatorio_rejeitados(arquivo_excel: str, df_rejeitados: pd.DataFrame,
+                                 caminho: str = CAMINHO_RELATORIO_CNPJS_REJEITADOS):
+    """Mostra o resumo dos CNPJs rejeitados e grava o relatório (substituindo o anterior)."""
+    if df_rejeitados.empty:
+        return
+    print(f"{len(df_rejeitados)} linhas com CNPJ inválido não serão consultadas "
+          f"({df_rejeitados['motivo'].value_counts().to_dict()}). Relatório em: {caminho}")
+    try:
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        df_rejeitados.assign(planilha=os.path.basename(arquivo_excel)).to_csv(caminho, index=False, sep=';', encoding='utf-8-sig')
+    except OSError as e:
+        print(f"Não foi possível gravar o relatório de CNPJs rejeitados: {e}")
+
+
+# Cache local (fora do drive compartilhado) com as tabelas CNPJ/EMPRESA já extraídas das planilhas
+CAMINHO_CACHE_PLANILHAS = os.path.join(os.path.expanduser("~"), ".consultacnd", "cache_planilhas.sqlite3")
+
+
+def _chave_cache_planilha(arquivo_excel: str, sheet1_header: int, sheet2_header: int) -> str:
+    """Monta a chave do cache a partir do caminho, data de modificação e tamanho do arquivo."""
+    info = os.stat(arquivo_excel)
+    return f"{os.path.abspath(arquivo_excel)}|{info.st_mtime_ns}|{info.st_size}|{sheet1_header}|{sheet2_header}"
+
+
+def _ler_cache_planilha(chave: str, caminho_cache: str):
+    """Retorna o DataFrame armazenado para a chave, ou None se não houver cache válido."""
+    if not os.path.exists(caminho_cache):
+        return None
+    try:
+        with sqlite3.connect(caminho_cache) as conn:
+            df = pd.read_sql("SELECT CNPJ, EMPRESA FROM empresas WHERE chave = ? ORDER BY ordem", conn, params=(chave,))
+        return df if not df.empty else None
+    except (sqlite3.Error, pd.errors.DatabaseError):
+        return None
+
+
+def _gravar_cache_planilha(chave: str, df_empresas: pd.DataFrame, caminho_cache: str):
+    """Substitui o conteúdo do cache pelo DataFrame da planilha atual."""
+    try:
+        os.makedirs(os.path.dirname(caminho_cache), exist_ok=True)
+        with sqlite3.connect(caminho_cache) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS empresas (chave TEXT, ordem INTEGER, CNPJ TEXT, EMPRESA TEXT)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_empresas_chave ON empresas (chave)")
+            # Apenas a versão mais recente de cada planilha é mantida
+            conn.execute("DELETE FROM empresas")
+            conn.executemany(
+                "INSERT INTO empresas (chave, ordem, CNPJ, EMPRESA) VALUES (?, ?, ?, ?)",
+                [(chave, i, str(cnpj), str(empresa)) for i, (cnpj, empresa) in
+                 enumerate(zip(df_empresas['CNPJ'], df_empresas['EMPRESA']))],
+            )
+    except sqlite3.Error as e:
+        print(f"Não foi possível gravar o cache da planilha: {e}")
+
+
+def _remover_cnpjs_duplicados(df_empresas: pd.DataFrame) -> pd.DataFrame:
+    """Mantém a primeira ocorrência de cada CNPJ (as duas abas podem listar a mesma empresa)."""
+    duplicados = df_empresas['CNPJ'].duplicated()
+    if duplicados.any():
+        print(f"{int(duplicados.sum())} CNPJs repetidos na planilha ignorados: {sorted(set(df_empresas.loc[duplicados, 'CNPJ']))}")
+    return df_empresas[~duplicados].reset_index(drop=True)
+
+
+def ler_planilhas_e_extrair_cnpjs(arquivo_excel: str, sheet1_header: int = 2, sheet2_header: int = 1,
+                                  caminho_cache: str = CAMINHO_CACHE_PLANILHAS) -> pd.DataFrame:
     """
-    Processa as planilhas de um arquivo Excel para extrair as colunas 'CNPJ' e 'Empresa'.
+    Processa as planilhas de um arquivo Excel para extrair as colunas 'CNPJ' e 'EMPRESA'.
+
+    O arquivo é aberto uma única vez para as duas abas, e o resultado é guardado em um
+    cache SQLite local indexado pelo caminho, data de modificação e tamanho do arquivo.
+    Execuções seguintes com a mesma planilha não precisam ler o xlsx novamente.
     
     Args:
         arquivo_excel (str): Caminho do arquivo Excel a ser processado.
         sheet1_header (int): Número da linha que contém o cabeçalho da primeira aba.
         sheet2_header (int): Número da linha que contém o cabeçalho da segunda aba.
+        caminho_cache (str): Arquivo SQLite do cache (None para desativar).
     
     Returns:
-        pd.DataFrame: DataFrame consolidado e limpo contendo as colunas 'CNPJ' e 'Empresa'.
+        pd.DataFrame: DataFrame consolidado e limpo contendo as colunas 'CNPJ' e 'EMPRESA',
+        com um único registro por CNPJ.
     """
     try:
-        # Ler as abas do Excel
-        df_aba1 = pd.read_excel(arquivo_excel, sheet_name=0, header=sheet1_header)  # Primeira aba
-        df_aba2 = pd.read_excel(arquivo_excel, sheet_name=1, header=sheet2_header)  # Segunda aba
+        chave = _chave_cache_planilha(arquivo_excel, sheet1_header, sheet2_header)
+        if caminho_cache:
+            df_empresas = _ler_cache_planilha(chave, caminho_cache)
+            if df_empresas is not None:
+                print(f"Planilha carregada do cache: {arquivo_excel}")
+                return _remover_cnpjs_duplicados(df_empresas)
+
+        # Ler as duas abas abrindo o arquivo uma única vez
+        with pd.ExcelFile(arquivo_excel) as planilha:
+            df_aba1 = planilha.parse(sheet_name=0, header=sheet1_header)  # Primeira aba
+            df_aba2 = planilha.parse(sheet_name=1, header=sheet2_header)  # Segunda aba
 
         # Verificar e ajustar as colunas
-        colunas_aba1 = df_aba1.columns.str.strip()
-        colunas_aba2 = df_aba2.columns.str.strip()
+        df_aba1.columns = df_aba1.columns.astype(str).str.strip()
+        df_aba2.columns = df_aba2.columns.astype(str).str.strip()
+        colunas_aba1 = df_aba1.columns
+        colunas_aba2 = df_aba2.columns
 
         if 'CNPJ' not in colunas_aba1 or ('Empresa' not in colunas_aba1 and 'EMPRESA' not in colunas_aba1):
             raise KeyError("Colunas 'CNPJ' ou 'Empresa'/'EMPRESA' não encontradas na primeira aba.")
         if 'CNPJ' not in colunas_aba2 or ('Empresa' not in colunas_aba2 and 'EMPRESA' not in colunas_aba2):
             raise KeyError("Colunas 'CNPJ' ou 'Empresa'/'EMPRESA' não encontradas na segunda aba.")
         
-        # Selecionar as colunas relevantes
-        df_aba1 = df_aba1[['CNPJ', 'Empresa' if 'Empresa' in colunas_aba1 else 'EMPRESA']]
-        df_aba2 = df_aba2[['CNPJ', 'Empresa' if 'Empresa' in colunas_aba2 else 'EMPRESA']]
+        # Selecionar as colunas relevantes, padronizando o nome da coluna de empresa
+        df_aba1 = df_aba1[['CNPJ', 'Empresa' if 'Empresa' in colunas_aba1 else 'EMPRESA']].set_axis(['CNPJ', 'EMPRESA'], axis=1)
+        df_aba2 = df_aba2[['CNPJ', 'Empresa' if 'Empresa' in colunas_aba2 else 'EMPRESA']].set_axis(['CNPJ', 'EMPRESA'], axis=1)
+
+        # Limpar os valores de CNPJ e garantir que sejam strings de 14 caracteres
+        df_aba1['CNPJ'] = df_aba1['CNPJ'].dropna().map(normalizar_cnpj)
+        df_aba2['CNPJ'] = df_aba2['CNPJ'].dropna().map(normalizar_cnpj)
 
-        # Limpar os valores de CNPJ e garantir que sejam strings de 14 dígitos
-        df_aba1['CNPJ'] = df_aba1['CNPJ'].dropna().apply(lambda x: str(x).split('.')[0].zfill(14))
-        df_aba2['CNPJ'] = df_aba2['CNPJ'].dropna().apply(lambda x: str(x).split('.')[0].zfill(14))
+        # Remover linhas com valores ausentes (o índice original identifica a linha no relatório)
+        df_aba1 = df_aba1.dropna(subset=['CNPJ', 'EMPRESA'])
+        df_aba2 = df_aba2.dropna(subset=['CNPJ', 'EMPRESA'])
 
-        # Remover linhas com valores ausentes
-        df_aba1 = df_aba1.dropna(subset=['CNPJ', 'EMPRESA']).reset_index(drop=True)
-        df_aba2 = df_aba2.dropna(subset=['CNPJ', 'EMPRESA']).reset_index(drop=True)
+        # CNPJs inválidos (dígito verificador, tamanho, caracteres) não chegam à API paga
+        df_aba1, df_rejeitados1 = separar_cnpjs_invalidos(df_aba1, "aba 1", sheet1_header)
+        df_aba2, df_rejeitados2 = separar_cnpjs_invalidos(df_aba2, "aba 2", sheet2_header)
+        _salvar_relatorio_rejeitados(arquivo_excel, pd.concat([df_rejeitados1, df_rejeitados2], ignore_index=True))
+        df_aba1 = df_aba1.reset_index(drop=True)
+        df_aba2 = df_aba2.reset_index(drop=True)
 
-        # Concatenar as duas abas
-        df_empresas = pd.concat([df_aba1, df_aba2], ignore_index=True)
+        # Concatenar as duas abas, sem repetir CNPJs (cada consulta repetida é cobrada)
+        df_empresas = _remover_cnpjs_duplicados(pd.concat([df_aba1, df_aba2], ignore_index=True))
 
-        # Limpar e padronizar os nomes das colunas
-        df_empresas.columns = df_empresas.columns.str.strip()
+        if caminho_cache:
+            _gravar_cache_planilha(chave, df_empresas, caminho_cache)
 
         return df_empresas
 
@@ -128,21 +367,16 @@ def ler_planilhas_e_extrair_cnpjs(arquivo_excel: str, sheet1_header: int = 2, sh
         return []
 
 
-# Chamada da função
-arquivo_caminho = r"G:\Drives compartilhados\Operacional\19 - AUTOMAÇAO\RPA\TIME INTERNO AUTOMAÇÃO\PLANILHA AVANTSEC"
-
-# Localizar o arquivo Excel
-try:
-    arquivo_excel = localizar_arquivo_excel(arquivo_caminho)
-except FileNotFoundError as e:
-    print(f"Erro: {e}")
-    exit()
-
-# Ler e extrair CNPJs
-lista_cnpjs = ler_planilhas_e_extrair_cnpjs(arquivo_excel)
-print(lista_cnpjs)
-# Exiba o resultado
-# if lista_cnpjs:
-#     print("Lista de CNPJs:", lista_cnpjs)
-# else:
-#     print("Nenhum CNPJ foi encontrado.")
+if __name__ == '__main__':
+    arquivo_caminho = r"G:\Drives compartilhados\Operacional\19 - AUTOMAÇAO\RPA\TIME INTERNO AUTOMAÇÃO\PLANILHA AVANTSEC"
+
+    # Localizar o arquivo Excel
+    try:
+        arquivo_excel = localizar_arquivo_excel(arquivo_caminho)
+    except FileNotFoundError as e:
+        print(f"Erro: {e}")
+        raise SystemExit(1)
+
+    # Ler e extrair CNPJs
+    lista_cnpjs = ler_planilhas_e_extrair_cnpjs(arquivo_excel)
+    print(lista_cnpjs)
@@ -0,0 +1,197 @@
+import hashlib
+import os
+import threading
+import uuid
+
+import requests
+import urllib3
+
+from executor import LimitadorTaxaPorHost
+from cliente_http import TIMEOUT_PADRAO, obter_sessao
+from agendador_retentativas import FalhaConsulta, FALHA_PDF
+
+# Downloads simultâneos de PDF no processo
+MAX_DOWNLOADS_SIMULTANEOS = 4
+
+# Blocos de leitura: começam em 64 KiB e crescem até 1 MiB enquanto a conexão entrega blocos cheios
+TAMANHO_BLOCO_MINIMO = 64 * 1024
+TAMANHO_BLOCO_MAXIMO = 1024 * 1024
+
+# Retomadas via HTTP Range depois de uma queda no meio da transferência
+MAX_RETOMADAS = 2
+
+# Um PDF começa com "%PDF-" e termina com "%%EOF" (seguido, no máximo, de espaços e quebras de linha)
+CABECALHO_PDF = b"%PDF-"
+MARCADOR_FIM_PDF = b"%%EOF"
+TAMANHO_FINAL_VERIFICADO = 1024
+
+TIPOS_ACEITOS = ("application/pdf", "application/octet-stream")
+
+# Falhas de transporte que interrompem a transferência e permitem retomar do ponto em que parou
+_ERROS_RETOMAVEIS = (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                     requests.exceptions.Timeout)
+
+
+def _erro_requests(erro: Exception) -> Exception:
+    """Converte as exceções do urllib3 (leitura direta de response.raw) nas do requests, como faz iter_content."""
+    if isinstance(erro, urllib3.exceptions.ProtocolError):
+        return requests.exceptions.ChunkedEncodingError(erro)
+    if isinstance(erro, urllib3.exceptions.ReadTimeoutError):
+        return requests.exceptions.ConnectionError(erro)
+    return erro
+
+
+def validar_pdf(caminho: str):
+    """Confere o cabeçalho "%PDF-" e o marcador "%%EOF" no final do arquivo."""
+    with open(caminho, "rb") as arquivo:
+        cabecalho = arquivo.read(len(CABECALHO_PDF))
+        arquivo.seek(0, os.SEEK_END)
+        tamanho = arquivo.tell()
+        arquivo.seek(max(0, tamanho - TAMANHO_FINAL_VERIFICADO))
+        final = arquivo.read()
+
+    if cabecalho != CABECALHO_PDF:
+        raise FalhaConsulta(FALHA_PDF, f"O arquivo não é um PDF válido: começa com {cabecalho!r}.")
+    if MARCADOR_FIM_PDF not in final:
+        raise FalhaConsulta(FALHA_PDF, f"PDF incompleto: marcador {MARCADOR_FIM_PDF!r} ausente ({tamanho} bytes).")
+
+
+class BaixadorPDFs():
+    """
+    Download de PDFs com paralelismo limitado, escrita atômica e retomada.
+
+    Cada PDF é gravado em um arquivo temporário, calculando o SHA-256 durante o download;
+    se a conexão cair no meio, a transferência continua do ponto em que parou com HTTP
+    Range (quando o host aceita) ou recomeça do zero. Ao final, o arquivo é validado pelo
+    cabeçalho e pelo marcador de fim do PDF, sincronizado com o disco (fsync) e só então
+    renomeado para o destino. Em caso de erro, o temporário é apagado: nenhum PDF truncado
+    fica para trás.
+
+    Parâmetros:
+        sessao (requests.Session): Sessão HTTP (padrão: a sessão compartilhada do processo).
+        limitador (LimitadorTaxaPorHost): Limite de requisições por host (padrão: sem limite).
+        max_downloads (int): Downloads simultâneos, somando todas as threads que usam o baixador.
+        max_retomadas (int): Retomadas após quedas no meio da transferência.
+    """
+
+    def __init__(self, sessao=None, limitador: LimitadorTaxaPorHost = None,
+                 max_downloads: int = MAX_DOWNLOADS_SIMULTANEOS, max_retomadas: int = MAX_RETOMADAS):
+        self.sessao = sessao or obter_sessao()
+        self.limitador = limitador or LimitadorTaxaPorHost(0)
+        self.max_downloads = max_downloads
+        self.max_retomadas = max_retomadas
+        self._vagas = threading.BoundedSemaphore(max_downloads)
+
+    def _transferir(self, url: str, arquivo, digest, inicio: int, validador: str = None):
+        """
+        Faz uma requisição a partir do byte `inicio` e grava o conteúdo no arquivo.
+
+        Retorna:
+            tuple: (digest, bytes no arquivo, aceita Range, validador para If-Range).
+        """
+        cabecalhos = {"Accept-Encoding": "identity"}  # Range e tamanhos sobre os bytes reais do arquivo
+        if inicio:
+            cabecalhos["Range"] = f"bytes={inicio}-"
+            if validador:
+                cabecalhos["If-Range"] = validador
+
+        self.limitador.aguardar(url)
+        with self.sessao.get(url, stream=True, timeout=TIMEOUT_PADRAO, headers=cabecalhos) as response:
+            response.raise_for_status()
+
+            content_type = response.headers.get('Content-Type', '')
+            if not content_type.startswith(TIPOS_ACEITOS):
+                raise FalhaConsulta(FALHA_PDF, f"O arquivo não é um PDF válido. Tipo recebido: {content_type}")
+
+            if inicio and response.status_code != 206:
+                # O host ignorou o Range (ou o arquivo mudou): recomeça do zero
+                arquivo.seek(0)
+                arquivo.truncate()
+                digest = hashlib.sha256()
+                inicio = 0
+
+            aceita_range = response.headers.get('Accept-Ranges', '').lower() == 'bytes' or response.status_code == 206
+            validador = response.headers.get('ETag') or response.headers.get('Last-Modified') or validador
+
+            # Blocos maiores para arquivos grandes; sem Content-Length, crescem enquanto vierem cheios
+            tamanho_total = int(response.headers.get('Content-Length') or 0)
+            bloco = min(TAMANHO_BLOCO_MAXIMO, max(TAMANHO_BLOCO_MINIMO, tamanho_total // 8))
+            gravados = inicio
+            try:
+                while True:
+                    dados = response.raw.read(bloco, decode_content=True)
+                    if not dados:
+                        break
+                    digest.update(dados)
+                    arquivo.write(dados)
+                    gravados += len(dados)
+                    if len(dados) == bloco and bloco < TAMANHO_BLOCO_MAXIMO:
+                        bloco *= 2
+            except Exception as e:
+                raise _TransferenciaInterrompida(_erro_requests(e), digest, gravados, aceita_range, validador) from e
+
+            if tamanho_total and gravados - inicio < tamanho_total:
+                erro = requests.exceptions.ChunkedEncodingError(
+                    f"Conexão encerrada após {gravados - inicio} de {tamanho_total} bytes.")
+                raise _TransferenciaInterrompida(erro, digest, gravados, aceita_range, validador)
+
+        return digest, gravados, aceita_range, validador
+
+    def baixar(self, url: str, destino: str) -> tuple:
+        """
+        Baixa o PDF de `url` para `destino` (escrita atômica).
+
+        Retorna:
+            tuple: (hash SHA-256 em hexadecimal, tamanho em bytes).
+        """
+        pasta = os.path.dirname(destino)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        temporario = os.path.join(pasta, f".{os.path.basename(destino)}.{uuid.uuid4().hex}.part")
+
+        with self._vagas:
+            try:
+                with open(temporario, "wb") as arquivo:
+                    digest, gravados, aceita_range, validador = hashlib.sha256(), 0, False, None
+                    retomadas = 0
+                    while True:
+                        try:
+                            inicio = gravados if aceita_range else 0
+                            if not inicio:
+                                arquivo.seek(0)
+                                arquivo.truncate()
+                                digest = hashlib.sha256()
+                            digest, gravados, aceita_range, validador = self._transferir(
+                                url, arquivo, digest, inicio, validador)
+                            break
+                        except _TransferenciaInterrompida as interrupcao:
+                            if retomadas >= self.max_retomadas or not isinstance(interrupcao.erro, _ERROS_RETOMAVEIS):
+                                raise interrupcao.erro
+                            retomadas += 1
+                            digest, gravados = interrupcao.digest, interrupcao.gravados
+                            aceita_range, validador = interrupcao.aceita_range, interrupcao.validador
+                            arquivo.flush()
+                            print(f"Download interrompido em {gravados} bytes; "
+                                  f"{'retomando com Range' if aceita_range else 'recomeçando'} ({retomadas}/{self.max_retomadas}).")
+
+                    arquivo.flush()
+                    os.fsync(arquivo.fileno())
+
+                validar_pdf(temporario)
+                os.replace(temporario, destino)
+                return digest.hexdigest(), gravados
+            finally:
+                if os.path.exists(temporario):
+                    os.remove(temporario)
+
+
+class _TransferenciaInterrompida(Exception):
+    """Queda no meio da transferência, com o estado necessário para retomá-la."""
+
+    def __init__(self, erro, digest, gravados, aceita_range, validador):
+        super().__init__(str(erro))
+        self.erro = erro
+        self.digest = digest
+        self.gravados = gravados
+        self.aceita_range = aceita_range
+        self.validador = validador
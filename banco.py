@@ -0,0 +1,78 @@
+import threading
+
+from contextlib import contextmanager
+
+# Servidor Postgres do db_consultacnd
+USUARIO_BANCO = "postgres"
+SENHA_BANCO = "djgr27041965"
+HOST_BANCO = "localhost"
+PORTA_BANCO = 5432
+NOME_BANCO = "db_consultacnd"
+
+# Pool de conexões de cada engine: conexões mantidas abertas, extras sob demanda, teste da
+# conexão antes do uso (pre-ping) e reciclagem periódica para não usar conexões derrubadas pelo servidor
+TAMANHO_POOL = 10
+MAX_CONEXOES_EXTRAS = 10
+RECICLAR_CONEXOES_SEGUNDOS = 1800
+ESPERA_CONEXAO_SEGUNDOS = 30
+
+_engines = {}
+_lock_engines = threading.Lock()
+
+
+def url_banco(nome_banco: str = NOME_BANCO) -> str:
+    """URL SQLAlchemy de um banco do servidor configurado."""
+    return f"postgresql+psycopg2://{USUARIO_BANCO}:{SENHA_BANCO}@{HOST_BANCO}:{PORTA_BANCO}/{nome_banco}"
+
+
+URL_BANCO = url_banco()
+
+
+def obter_engine(url: str = URL_BANCO):
+    """
+    Retorna a engine compartilhada do processo para a URL, criando-a no primeiro uso.
+
+    A criação não abre conexões: a primeira só é feita quando alguém a pede ao pool.
+    A engine e o pool são seguros para uso a partir de várias threads.
+    """
+    engine = _engines.get(url)
+    if engine is None:
+        with _lock_engines:
+            engine = _engines.get(url)
+            if engine is None:
+                from sqlalchemy import create_engine  # Importado só no primeiro uso do banco
+
+                engine = create_engine(
+                    url,
+                    pool_size=TAMANHO_POOL,
+                    max_overflow=MAX_CONEXOES_EXTRAS,
+                    pool_pre_ping=True,
+                    pool_recycle=RECICLAR_CONEXOES_SEGUNDOS,
+                    pool_timeout=ESPERA_CONEXAO_SEGUNDOS,
+                )
+                _engines[url] = engine
+    return engine
+
+
+@contextmanager
+def conexao(url: str = URL_BANCO, autocommit: bool = False):
+    """Conexão do pool para leituras (ou comandos fora de transação, com `autocommit`); devolvida ao sair."""
+    with obter_engine(url).connect() as conn:
+        if autocommit:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        yield conn
+
+
+@contextmanager
+def transacao(url: str = URL_BANCO):
+    """Conexão do pool com uma transação: commit ao sair normalmente, rollback em caso de exceção."""
+    with obter_engine(url).begin() as conn:
+        yield conn
+
+
+def fechar_engine(url: str = URL_BANCO):
+    """Fecha as conexões do pool da URL; uma nova engine é criada no próximo uso."""
+    with _lock_engines:
+        engine = _engines.pop(url, None)
+    if engine is not None:
+        engine.dispose()
@@ -0,0 +1,248 @@
+"""
+Benchmark da consulta de CND contra servidores locais que imitam a Infosimples e o host dos PDFs.
+
+Executa o código real (ConsultaCND.processar_cnpj / salvar_pdf dentro do PipelineConsulta)
+sem gastar consultas pagas. Os servidores simulados têm latência, mistura de respostas
+(200, 6xx, JSON inválido, PDF com Content-Type errado) e tamanho de PDF configuráveis.
+
+Uso:
+    python benchmark_consulta.py --tamanhos 10 1000 10000 --latencia-api 0.05 --erro-6xx 0.05
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from cliente_http import criar_sessao
+from consulta_cnd import ConsultaCND
+from pipeline import PipelineConsulta
+from repositorio_pdfs import RepositorioPDFs
+from baixador_pdfs import BaixadorPDFs
+from agendador_retentativas import AgendadorRetentativas, PoliticaRetentativa
+
+CAMINHO_API = "/api/v2/consultas/receita-federal/pgfn"
+
+
+class CenarioMock():
+    """Comportamento dos servidores simulados: latências e proporção de cada tipo de resposta."""
+
+    def __init__(self, latencia_api: float = 0.05, latencia_pdf: float = 0.02, erro_6xx: float = 0.0,
+                 json_invalido: float = 0.0, pdf_invalido: float = 0.0, tamanho_pdf: int = 50 * 1024):
+        self.latencia_api = latencia_api
+        self.latencia_pdf = latencia_pdf
+        self.erro_6xx = erro_6xx
+        self.json_invalido = json_invalido
+        self.pdf_invalido = pdf_invalido
+        self.tamanho_pdf = tamanho_pdf
+
+
+def _criar_handler_api(cenario: CenarioMock, url_pdf: str):
+    class HandlerApi(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, como na API real
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            tamanho = int(self.headers.get("Content-Length", 0))
+            parametros = parse_qs(self.rfile.read(tamanho).decode())
+            cnpj = parametros.get("cnpj", [""])[0]
+            time.sleep(cenario.latencia_api)
+
+            sorteio = random.random()
+            if sorteio < cenario.json_invalido:
+                corpo = b'{"code": 200, "data": ['
+            elif sorteio < cenario.json_invalido + cenario.erro_6xx:
+                corpo = json.dumps({"code": random.choice([600, 605, 615]), "code_message": "Erro simulado"}).encode()
+            else:
+                tipo = "html" if random.random() < cenario.pdf_invalido else "pdf"
+                corpo = json.dumps({
+                    "code": 200,
+                    "code_message": "A requisição foi processada com sucesso.",
+                    "data": [{
+                        "certidao": "Certidão Negativa de Débitos",
+                        "certidao_codigo": "1234.5678.9ABC.DEF0",
+                        "cnpj": cnpj,
+                        "normalizado_cnpj": cnpj,
+                        "razao_social": f"EMPRESA {cnpj}",
+                        "validade": "2030-01-01",
+                        "validade_prorrogada": "2030-01-01",
+                        "site_receipt": f"{url_pdf}/{cnpj}.pdf?tipo={tipo}",
+                    }],
+                }).encode()
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+    return HandlerApi
+
+
+def _criar_handler_pdf(cenario: CenarioMock):
+    conteudo_pdf = b"%PDF-1.4\n" + b"0" * max(0, cenario.tamanho_pdf - 15) + b"\n%%EOF\n"
+
+    class HandlerPdf(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            time.sleep(cenario.latencia_pdf)
+            tipo = parse_qs(urlparse(self.path).query).get("tipo", ["pdf"])[0]
+            corpo = conteudo_pdf if tipo == "pdf" else b"<html>Erro</html>"
+            self.send_response(200)
+            self.send_header("Content-Type", "application/pdf" if tipo == "pdf" else "text/html")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+    return HandlerPdf
+
+
+@contextlib.contextmanager
+def servidores_mock(cenario: CenarioMock):
+    """Sobe os servidores simulados da API e dos PDFs e retorna a URL da API."""
+    servidor_pdf = ThreadingHTTPServer(("127.0.0.1", 0), _criar_handler_pdf(cenario))
+    url_pdf = f"http://127.0.0.1:{servidor_pdf.server_address[1]}/pdf"
+    servidor_api = ThreadingHTTPServer(("127.0.0.1", 0), _criar_handler_api(cenario, url_pdf))
+    for servidor in (servidor_api, servidor_pdf):
+        servidor.daemon_threads = True
+        servidor.handle_error = lambda request, endereco: None  # Conexões encerradas pelo cliente no fim da execução
+
+    threads = [threading.Thread(target=servidor.serve_forever, daemon=True) for servidor in (servidor_api, servidor_pdf)]
+    for thread in threads:
+        thread.start()
+    try:
+        yield f"http://127.0.0.1:{servidor_api.server_address[1]}{CAMINHO_API}"
+    finally:
+        for servidor in (servidor_api, servidor_pdf):
+            servidor.shutdown()
+            servidor.server_close()
+
+
+def gerar_cnpjs(quantidade: int) -> list:
+    """Gera uma lista sintética de pares (CNPJ, empresa)."""
+    return [(f"{i:08d}0001{i % 100:02d}", f"EMPRESA {i:05d}") for i in range(quantidade)]
+
+
+def _percentil(valores: list, percentil: int) -> float:
+    if len(valores) < 2:
+        return valores[0] if valores else 0.0
+    return statistics.quantiles(valores, n=100)[percentil - 1]
+
+
+def executar_benchmark(quantidade: int, cenario: CenarioMock, workers_busca: int = 8,
+                       workers_download: int = 4, max_tentativas: int = 3, medir_memoria: bool = True) -> dict:
+    """
+    Processa `quantidade` CNPJs sintéticos contra os servidores simulados.
+
+    O pico de memória é medido com tracemalloc, que deixa a execução mais lenta;
+    use `medir_memoria=False` para medir apenas a vazão.
+
+    Retorna:
+        dict: CNPJs por minuto, latência p50/p95 por CNPJ (consulta até PDF salvo),
+        pico de memória e contagem de sucessos e falhas.
+    """
+    inicio_cnpj = {}
+    latencias = []
+    lock = threading.Lock()
+
+    with servidores_mock(cenario) as url_api, tempfile.TemporaryDirectory() as pasta:
+        politica = PoliticaRetentativa(max_tentativas=max_tentativas, atrasos_base={
+            "rede": 0.01, "json": 0.01, "api": 0.01, "pdf": 0.01, "desconhecida": 0.01,
+        })
+        sessao = criar_sessao(pool_padrao=max(workers_busca, workers_download))
+        consulta = ConsultaCND(
+            "token-benchmark", pasta, url=url_api, sessao=sessao, politica=politica,
+            repositorio=RepositorioPDFs(os.path.join(pasta, "repositorio")),
+            baixador=BaixadorPDFs(sessao, max_downloads=workers_download),
+        )
+
+        def buscar(cnpj, empresa, tentativa=0):
+            with lock:
+                inicio_cnpj.setdefault(cnpj, time.perf_counter())
+            return consulta.processar_cnpj(cnpj, empresa, tentativa=tentativa)
+
+        def baixar(item, tentativa=0):
+            df = consulta.baixar_certidao(item, tentativa=tentativa)
+            with lock:
+                latencias.append(time.perf_counter() - inicio_cnpj[item["cnpj"]])
+            return df
+
+        sucessos = []
+        pipeline = PipelineConsulta(
+            buscar, baixar, lambda lote: sucessos.append(len(lote)),
+            workers_busca=workers_busca, workers_download=workers_download,
+            agendador=AgendadorRetentativas(politica),
+        )
+
+        if medir_memoria:
+            tracemalloc.start()
+        inicio = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            falhas = pipeline.executar(gerar_cnpjs(quantidade))
+        duracao = time.perf_counter() - inicio
+        pico_memoria = 0
+        if medir_memoria:
+            _, pico_memoria = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    return {
+        "cnpjs": quantidade,
+        "sucessos": sum(sucessos),
+        "falhas": len(falhas),
+        "duracao_s": round(duracao, 3),
+        "cnpjs_por_minuto": round(quantidade / duracao * 60, 1),
+        "latencia_p50_s": round(_percentil(latencias, 50), 4),
+        "latencia_p95_s": round(_percentil(latencias, 95), 4),
+        "pico_memoria_mb": round(pico_memoria / 1024 ** 2, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da consulta de CND com servidores simulados.")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--latencia-api", type=float, default=0.05)
+    parser.add_argument("--latencia-pdf", type=float, default=0.02)
+    parser.add_argument("--erro-6xx", type=float, default=0.05, help="Proporção de respostas 6xx.")
+    parser.add_argument("--json-invalido", type=float, default=0.01, help="Proporção de JSON malformado.")
+    parser.add_argument("--pdf-invalido", type=float, default=0.01, help="Proporção de PDFs com Content-Type errado.")
+    parser.add_argument("--tamanho-pdf", type=int, default=50 * 1024, help="Tamanho do PDF em bytes.")
+    parser.add_argument("--workers-busca", type=int, default=8)
+    parser.add_argument("--workers-download", type=int, default=4)
+    parser.add_argument("--sem-memoria", action="store_true", help="Não mede o pico de memória (tracemalloc).")
+    parser.add_argument("--saida-json", help="Arquivo onde gravar o relatório em JSON.")
+    opcoes = parser.parse_args()
+
+    cenario = CenarioMock(opcoes.latencia_api, opcoes.latencia_pdf, opcoes.erro_6xx,
+                          opcoes.json_invalido, opcoes.pdf_invalido, opcoes.tamanho_pdf)
+    relatorio = []
+    for quantidade in opcoes.tamanhos:
+        resultado = executar_benchmark(quantidade, cenario, opcoes.workers_busca, opcoes.workers_download,
+                                       medir_memoria=not opcoes.sem_memoria)
+        relatorio.append(resultado)
+        print(f"{quantidade:>6} CNPJs: {resultado['cnpjs_por_minuto']:>9.1f} CNPJs/min | "
+              f"p50 {resultado['latencia_p50_s']:.3f} s | p95 {resultado['latencia_p95_s']:.3f} s | "
+              f"pico {resultado['pico_memoria_mb']:.1f} MB | falhas {resultado['falhas']}")
+
+    if opcoes.saida_json:
+        with open(opcoes.saida_json, "w", encoding="utf-8") as arquivo:
+            json.dump(relatorio, arquivo, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import pandas as pd
+
+from datetime import datetime, timedelta
+
+from arquivo import normalizar_cnpj
+
+# Margem de segurança padrão: certidões que vencem antes disso são consultadas novamente
+MARGEM_VALIDADE_DIAS = 15
+
+# Resultado de cada CNPJ registrado ao fim de uma execução (tabela execucoes_consulta_cnpjs)
+RESULTADO_SUCESSO = "sucesso"
+RESULTADO_FALHA = "falha"
+RESULTADO_CACHE = "cache"
+RESULTADO_PENDENTE = "pendente"  # Não processado (execução limitada ou interrompida)
+
+
+def validade_efetiva(df_certidoes: pd.DataFrame) -> pd.Series:
+    """Maior data entre DATA_VALIDADE e DATA_VALIDADE_PRORROGADA de cada certidão."""
+    return pd.concat([
+        pd.to_datetime(df_certidoes['data_validade'], errors='coerce'),
+        pd.to_datetime(df_certidoes['data_validade_prorrogada'], errors='coerce'),
+    ], axis=1).max(axis=1)
+
+
+def separar_certidoes_validas(df_cnpjs: pd.DataFrame, df_certidoes: pd.DataFrame,
+                              margem_dias: int = MARGEM_VALIDADE_DIAS, hoje: datetime = None):
+    """
+    Separa os CNPJs que ainda têm certidão válida no banco dos que precisam ser consultados.
+
+    A validade considerada é a maior entre DATA_VALIDADE e DATA_VALIDADE_PRORROGADA.
+    Uma certidão só é reaproveitada se continuar válida após a margem de segurança.
+
+    Parâmetros:
+        df_cnpjs (pd.DataFrame): Empresas a consultar, com a coluna 'CNPJ'.
+        df_certidoes (pd.DataFrame): Última certidão por CNPJ, como retornada por
+            dbController.ler_ultimas_certidoes (ou None se o banco não estiver disponível).
+        margem_dias (int): Dias mínimos de validade restante para pular a consulta.
+        hoje (datetime): Data de referência (padrão: agora).
+
+    Retorna:
+        tuple: (df_a_consultar, df_em_cache), ambos com as colunas de df_cnpjs.
+    """
+    if df_certidoes is None or df_certidoes.empty:
+        print(f"Cache de certidões: 0 acertos, {len(df_cnpjs)} faltas.")
+        return df_cnpjs, df_cnpjs.iloc[0:0]
+
+    limite = pd.Timestamp((hoje or datetime.now()) + timedelta(days=margem_dias))
+
+    validade = validade_efetiva(df_certidoes)
+    cnpjs_validos = df_certidoes.loc[validade >= limite, 'cod_cnpj_normalizado'].map(normalizar_cnpj)
+
+    em_cache = df_cnpjs['CNPJ'].map(normalizar_cnpj).isin(set(cnpjs_validos))
+    df_em_cache = df_cnpjs[em_cache]
+    df_a_consultar = df_cnpjs[~em_cache]
+
+    print(f"Cache de certidões: {len(df_em_cache)} acertos, {len(df_a_consultar)} faltas "
+          f"(margem de {margem_dias} dias).")
+    return df_a_consultar, df_em_cache
+
+
+def separar_delta(df_cnpjs: pd.DataFrame, df_ultima_execucao: pd.DataFrame, df_certidoes: pd.DataFrame,
+                  margem_dias: int = MARGEM_VALIDADE_DIAS, hoje: datetime = None):
+    """
+    Compara os CNPJs da planilha atual com os da última execução concluída.
+
+    São consultados os CNPJs novos, os que falharam (ou ficaram pendentes) na última
+    execução e os mantidos cuja certidão vence dentro da margem de segurança.
+
+    Parâmetros:
+        df_cnpjs (pd.DataFrame): Empresas da planilha atual, com a coluna 'CNPJ'.
+        df_ultima_execucao (pd.DataFrame): Resultado por CNPJ da última execução concluída,
+            como retornado por dbController.ler_ultima_execucao (ou None).
+        df_certidoes (pd.DataFrame): Última certidão dos CNPJs mantidos (ver separar_certidoes_validas).
+        margem_dias (int): Dias mínimos de validade restante para pular a consulta.
+        hoje (datetime): Data de referência (padrão: agora).
+
+    Retorna:
+        tuple: (df_a_consultar, df_em_cache, removidos), com os DataFrames nas colunas
+        de df_cnpjs e a lista dos CNPJs que saíram da planilha.
+    """
+    if df_ultima_execucao is None or df_ultima_execucao.empty:
+        print("Modo delta: nenhuma execução concluída encontrada; usando a planilha completa.")
+        df_a_consultar, df_em_cache = separar_certidoes_validas(df_cnpjs, df_certidoes, margem_dias, hoje)
+        return df_a_consultar, df_em_cache, []
+
+    cnpjs_atuais = df_cnpjs['CNPJ'].map(normalizar_cnpj)
+    anteriores = df_ultima_execucao['cod_cnpj_normalizado'].map(normalizar_cnpj)
+    refazer = set(anteriores[df_ultima_execucao['resultado'].isin([RESULTADO_FALHA, RESULTADO_PENDENTE])])
+
+    novos = ~cnpjs_atuais.isin(set(anteriores))
+    repetir = cnpjs_atuais.isin(refazer)
+    removidos = sorted(set(anteriores) - set(cnpjs_atuais))
+
+    # Os mantidos só são consultados se a certidão estiver perto do vencimento
+    df_mantidos = df_cnpjs[~novos & ~repetir]
+    df_vencendo, df_em_cache = separar_certidoes_validas(df_mantidos, df_certidoes, margem_dias, hoje)
+    df_a_consultar = pd.concat([df_cnpjs[novos | repetir], df_vencendo])
+
+    print(f"Modo delta: {int(novos.sum())} novos, {int(repetir.sum())} com falha na última execução, "
+          f"{len(df_vencendo)} perto do vencimento, {len(df_em_cache)} sem alteração, {len(removidos)} removidos.")
+    return df_a_consultar, df_em_cache, removidos
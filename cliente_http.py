@@ -0,0 +1,78 @@
+import threading
+import requests
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Timeouts explícitos (conexão, leitura) em segundos. A API da Infosimples pode
+# levar até o seu parâmetro "timeout" (300 s) para responder, por isso a leitura
+# tem uma folga sobre esse valor.
+TIMEOUT_CONEXAO = 10
+TIMEOUT_LEITURA = 330
+TIMEOUT_PADRAO = (TIMEOUT_CONEXAO, TIMEOUT_LEITURA)
+
+# Tamanho do pool de conexões keep-alive para hosts sem configuração própria
+POOL_PADRAO = 10
+
+_sessao = None
+_lock_sessao = threading.Lock()
+
+
+def _criar_adaptador(tamanho_pool: int, tentativas: int, backoff: float) -> HTTPAdapter:
+    """
+    Cria um adaptador HTTP com pool de conexões e retentativa no nível de transporte.
+
+    Falhas de conexão são repetidas para qualquer método (a requisição não chegou
+    ao servidor). Erros de leitura e status 5xx só são repetidos para métodos
+    idempotentes, para não duplicar consultas pagas feitas via POST.
+    """
+    retry = Retry(
+        total=tentativas,
+        connect=tentativas,
+        read=tentativas,
+        status=tentativas,
+        backoff_factor=backoff,
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        raise_on_status=False,
+    )
+    return HTTPAdapter(pool_connections=1, pool_maxsize=tamanho_pool, pool_block=True, max_retries=retry)
+
+
+def criar_sessao(pools_por_host: dict = None, pool_padrao: int = POOL_PADRAO,
+                 tentativas: int = 3, backoff: float = 0.5) -> requests.Session:
+    """
+    Cria uma sessão HTTP com conexões persistentes (keep-alive) reutilizadas entre requisições.
+
+    Parâmetros:
+        pools_por_host (dict): Mapeia URL base (ex.: 'https://api.infosimples.com')
+            para o tamanho do pool de conexões daquele host.
+        pool_padrao (int): Tamanho do pool para os demais hosts.
+        tentativas (int): Número de retentativas no nível de transporte.
+        backoff (float): Fator de espera exponencial entre as retentativas.
+
+    Retorna:
+        requests.Session: Sessão pronta para uso, segura para várias threads.
+    """
+    sessao = requests.Session()
+    adaptador_padrao = _criar_adaptador(pool_padrao, tentativas, backoff)
+    sessao.mount("https://", adaptador_padrao)
+    sessao.mount("http://", adaptador_padrao)
+
+    for prefixo, tamanho_pool in (pools_por_host or {}).items():
+        sessao.mount(prefixo, _criar_adaptador(tamanho_pool, tentativas, backoff))
+
+    return sessao
+
+
+def obter_sessao(pools_por_host: dict = None, **kwargs) -> requests.Session:
+    """
+    Retorna a sessão HTTP compartilhada do processo, criando-a na primeira chamada.
+
+    Os parâmetros só têm efeito na primeira chamada; as seguintes reutilizam a mesma sessão.
+    """
+    global _sessao
+    with _lock_sessao:
+        if _sessao is None:
+            _sessao = criar_sessao(pools_por_host, **kwargs)
+        return _sessao
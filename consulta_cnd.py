@@ -0,0 +1,240 @@
+import os
+import re
+import pandas as pd
+
+from datetime import datetime
+
+from executor import LimitadorTaxaPorHost
+from cliente_http import TIMEOUT_PADRAO, obter_sessao
+from diario_execucao import API_OK, PDF_SALVO
+from agendador_retentativas import PoliticaRetentativa, FalhaConsulta, FALHA_API, FALHA_SEM_PDF, classificar_falha
+from metricas import ColetorMetricas
+from repositorio_pdfs import RepositorioPDFs
+from baixador_pdfs import BaixadorPDFs
+from service import TIPOS_DF_CONSULTACND
+from arquivo import normalizar_cnpj
+
+# URL da consulta de certidão da PGFN na Infosimples
+URL_API = 'https://api.infosimples.com/api/v2/consultas/receita-federal/pgfn'
+
+
+# Colunas calculadas: coluna -> (campo de origem, caracteres removidos em uma única passada de regex)
+COLUNAS_NORMALIZADAS = {
+    'cod_cnpj': ('cnpj', r'[./-]'),
+    'cod_certidao': ('certidao_codigo', r'\.'),
+}
+
+# Formatos das datas da Infosimples, tentados em ordem (ISO8601 cobre os campos "normalizado_*")
+FORMATOS_DATA = ("%d/%m/%Y", "ISO8601")
+FORMATOS_DATA_HORA = ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "ISO8601")
+FORMATOS_POR_CAMPO = {
+    'consulta_datahora': FORMATOS_DATA_HORA,
+    'normalizado_emissao_datahora': FORMATOS_DATA_HORA,
+}
+
+
+def _converter_datas(serie: pd.Series, formatos: tuple) -> pd.Series:
+    # Colunas que já são datas não são convertidas de novo
+    if not pd.api.types.is_datetime64_any_dtype(serie):
+        texto = serie.astype("string")
+        datas = pd.Series(pd.NaT, index=serie.index, dtype="datetime64[ns]")
+        for formato in formatos:
+            faltantes = datas.isna() & texto.notna()
+            if not faltantes.any():
+                break
+            convertidas = pd.to_datetime(texto[faltantes], format=formato, errors='coerce')
+            if getattr(convertidas.dt, 'tz', None) is not None:
+                convertidas = convertidas.dt.tz_localize(None)
+            datas[faltantes] = convertidas
+        serie = datas
+    return serie.astype("datetime64[ns]").dt.normalize()  # DATE no banco
+
+
+# Função para limpar e tratar os dados: aplicada uma única vez por lote, com as colunas e tipos de
+# df_consultacnd (service.py); o resultado pode ser gravado diretamente por dbController.inserir_dados
+def limpar_e_tratar_dados(df: pd.DataFrame, data_consulta: datetime) -> pd.DataFrame:
+    df = df.assign(data_consulta_api=data_consulta)
+    for coluna, (origem, padrao) in COLUNAS_NORMALIZADAS.items():
+        if origem in df.columns:
+            df[coluna] = df[origem].astype("string").str.replace(padrao, '', regex=True)
+
+    colunas = {}
+    for campo, tipo in TIPOS_DF_CONSULTACND.items():
+        serie = df[campo] if campo in df.columns else pd.Series(pd.NA, index=df.index, dtype="object")
+        if tipo == 'data':
+            colunas[campo] = _converter_datas(serie, FORMATOS_POR_CAMPO.get(campo, FORMATOS_DATA))
+        elif tipo == 'numero':
+            colunas[campo] = pd.to_numeric(serie, errors='coerce')
+        else:
+            colunas[campo] = serie.astype("string")
+
+    # cod_cnpj e cnpj_consultado não são gravados no banco; cnpj_consultado é o CNPJ pedido à API
+    # (normalizado como na planilha) e identifica o CNPJ no diário e nas falhas de gravação
+    for coluna in ('cod_cnpj', 'cnpj_consultado'):
+        colunas[coluna] = df[coluna] if coluna in df.columns else pd.Series(pd.NA, index=df.index, dtype="string")
+    return pd.DataFrame(colunas, index=df.index)
+
+
+class ConsultaCND():
+    """
+    Etapas de consulta de um CNPJ: chamada à API da Infosimples e download do PDF da certidão.
+
+    Reúne a configuração usada pelas etapas (URL, token, pasta de destino, sessão HTTP,
+    limitador de taxa, diário e política de retentativas), de modo que o mesmo código
+    seja usado pela execução real e pelo benchmark contra servidores locais.
+
+    Parâmetros:
+        token (str): Token da Infosimples.
+        pasta_destino (str): Pasta onde ficam as subpastas de cada empresa.
+        url (str): Endpoint da consulta.
+        timeout_api (int): Parâmetro "timeout" enviado à Infosimples, em segundos.
+        sessao (requests.Session): Sessão HTTP (padrão: a sessão compartilhada do processo).
+        limitador (LimitadorTaxaPorHost): Limite de requisições por host (padrão: sem limite).
+        diario (DiarioExecucao): Diário da execução (opcional).
+        politica (PoliticaRetentativa): Define a preferência de emissão de cada tentativa.
+        data_consulta (datetime): Data registrada nos resultados e nos nomes dos PDFs.
+        metricas (ColetorMetricas): Coletor dos tempos por etapa e das respostas da API.
+        repositorio (RepositorioPDFs): Repositório dos PDFs por hash (padrão: o repositório local).
+        baixador (BaixadorPDFs): Download dos PDFs (padrão: um baixador com a sessão e o limitador acima).
+        governador (GovernadorCota): Cota de consultas pagas compartilhada entre processos (opcional).
+    """
+
+    def __init__(self, token: str, pasta_destino: str, url: str = URL_API, timeout_api: int = 300,
+                 sessao=None, limitador: LimitadorTaxaPorHost = None, diario=None,
+                 politica: PoliticaRetentativa = None, data_consulta: datetime = None,
+                 metricas: ColetorMetricas = None, repositorio: RepositorioPDFs = None,
+                 baixador: BaixadorPDFs = None, governador=None):
+        self.args = {
+            "token": token,
+            "preferencia_emissao": "nova",  # Inicialmente configurado como nova
+            "timeout": timeout_api,
+        }
+        self.pasta_destino = pasta_destino
+        self.url = url
+        self.sessao = sessao or obter_sessao()
+        self.limitador = limitador or LimitadorTaxaPorHost(0)
+        self.diario = diario
+        self.politica = politica or PoliticaRetentativa()
+        self.data_consulta = data_consulta or datetime.now()
+        self.metricas = metricas or ColetorMetricas()
+        self.repositorio = repositorio or RepositorioPDFs()
+        self.baixador = baixador or BaixadorPDFs(self.sessao, self.limitador)
+        self.governador = governador
+
+    # Função para salvar o PDF (uma tentativa; as retentativas ficam a cargo do agendador).
+    # O conteúdo vai para o repositório por hash e a pasta da empresa recebe o arquivo uma única vez;
+    # retorna o hash e o caminho do arquivo com o conteúdo (o destino ou um PDF idêntico já existente).
+    def salvar_pdf(self, link: str, destino: str, cnpj: str = None):
+        # Download atômico e validado para a pasta temporária do repositório, calculando o hash ao mesmo tempo
+        temporario = self.repositorio.caminho_temporario()
+        with self.metricas.medir('pdf', cnpj):
+            hash_pdf, bytes_pdf = self.baixador.baixar(link, temporario)
+        self.metricas.registrar_bytes_pdf(bytes_pdf)
+        repetido = self.repositorio.guardar_arquivo(temporario, hash_pdf)
+
+        caminho = self.repositorio.publicar(hash_pdf, destino)
+        if caminho != destino:
+            print(f"PDF idêntico ao já salvo em: {caminho}")
+        else:
+            print(f"PDF salvo com sucesso em: {destino}{' (conteúdo já existente no repositório)' if repetido else ''}")
+        return hash_pdf, caminho
+
+    # Estágio de consulta: chama a API para um CNPJ e monta os registros da resposta (a limpeza é feita por lote).
+    # Faz uma única tentativa e levanta uma exceção classificada em caso de falha; o agendador
+    # decide quando repetir e a política define a preferência de emissão ("nova"/"2via") de cada tentativa.
+    # Não altera estado compartilhado, o que permite executá-la em várias threads ao mesmo tempo.
+    def processar_cnpj(self, cnpj: str, empresa: str, tentativa: int = 0):
+        cnpj_normalizado = normalizar_cnpj(cnpj)  # Normalizar CNPJ (numérico ou alfanumérico)
+
+        # Criar subpasta para o CNPJ
+        subpasta_cnpj = os.path.join(self.pasta_destino, re.sub(r'[<>:"/\\|?*]', '', empresa.strip()))  # Remove caracteres inválidos do nome da empresa
+        os.makedirs(subpasta_cnpj, exist_ok=True)
+
+        preferencia = self.politica.preferencia(tentativa)
+        # Resposta já paga em uma execução interrompida
+        response_json = self.diario.payload_salvo(cnpj_normalizado) if self.diario else None
+
+        if response_json is not None:
+            print(f"Retomando CNPJ {cnpj_normalizado} com a resposta registrada no diário.")
+        else:
+            # Fazendo a requisição
+            parametros = {**self.args, "preferencia_emissao": preferencia, "cnpj": cnpj_normalizado}
+            if self.governador:
+                self.governador.aguardar(cnpj_normalizado)  # Cota compartilhada: taxa global e orçamento
+            self.limitador.aguardar(self.url)
+            try:
+                with self.metricas.medir('api', cnpj_normalizado, rotulo=preferencia), \
+                        self.sessao.post(self.url, data=parametros, timeout=TIMEOUT_PADRAO) as response:
+                    response_json = response.json()  # JSON inválido é classificado pelo agendador
+            except Exception as e:
+                self.metricas.registrar_resposta(classificar_falha(e))
+                if self.governador:
+                    self.governador.registrar(classificar_falha(e))
+                raise
+            self.metricas.registrar_resposta(response_json.get('code'))
+            if self.governador:
+                self.governador.registrar(response_json.get('code'))
+
+        # Se o código não for 200, falha classificada pelo código da Infosimples
+        if response_json.get('code') != 200:
+            raise FalhaConsulta(
+                FALHA_API,
+                f"Erro na API para CNPJ {cnpj_normalizado} (Tentativa {tentativa + 1}): "
+                f"{response_json.get('code')} - {response_json.get('code_message')}",
+                codigo=response_json.get('code'),
+            )
+
+        print(f"Retorno com sucesso para CNPJ {cnpj_normalizado}: {response_json['data']}")
+
+        # Registros da resposta (o DataFrame é montado uma única vez por lote, na gravação)
+        if isinstance(response_json['data'], list):
+            registros = [dict(item) for item in response_json['data']]
+        elif isinstance(response_json['data'], dict):
+            registros = [dict(response_json['data'])]
+        else:
+            raise FalhaConsulta(FALHA_API, f"Formato de dados inesperado para CNPJ {cnpj_normalizado}.")
+        for registro in registros:
+            registro['code'] = response_json['code']
+            registro['code_message'] = response_json.get('code_message')
+
+        # Sem 'site_receipt' a consulta é repetida aqui, no estágio da API, com a outra preferência de emissão
+        if not any(registro.get('site_receipt') for registro in registros):
+            raise FalhaConsulta(FALHA_SEM_PDF, f"Resposta sem 'site_receipt' para CNPJ {cnpj_normalizado} "
+                                               f"(preferência {preferencia}).")
+
+        # Só uma resposta utilizável fica no diário para ser reaproveitada
+        if self.diario:
+            self.diario.registrar(cnpj_normalizado, API_OK, response_json)
+
+        # Segue para o estágio de download do PDF
+        return {
+            "cnpj": cnpj_normalizado,
+            "subpasta": subpasta_cnpj,
+            "preferencia": preferencia,
+            "registros": registros,
+        }
+
+    # Estágio de download: salva o PDF indicado em 'site_receipt' e retorna os registros finais do CNPJ
+    def baixar_certidao(self, consulta: dict, tentativa: int = 0):
+        cnpj_normalizado = consulta["cnpj"]
+        registros = consulta["registros"]
+
+        # Verificando e salvando o PDF
+        for item in registros:
+            if item.get('site_receipt'):
+                pdf_url = item['site_receipt']
+                data_formatada = self.data_consulta.strftime('%Y-%m-%d_%H-%M-%S')
+                pdf_nome = f"{cnpj_normalizado}_{consulta['preferencia']}_{data_formatada}.pdf"
+                pdf_caminho = os.path.join(consulta["subpasta"], pdf_nome)
+
+                hash_pdf, pdf_caminho = self.salvar_pdf(pdf_url, pdf_caminho, cnpj_normalizado)
+                for registro in registros:
+                    registro['caminho_pdf'] = pdf_caminho
+                    registro['hash_pdf'] = hash_pdf
+                    registro['cnpj_consultado'] = cnpj_normalizado
+                if self.diario:
+                    self.diario.registrar(cnpj_normalizado, PDF_SALVO)
+                print(f"PDF salvo para CNPJ {cnpj_normalizado}: {pdf_caminho}")
+                return registros  # Retorna apenas o sucesso com PDF salvo
+
+        raise FalhaConsulta(FALHA_SEM_PDF, f"Resposta sem 'site_receipt' para CNPJ {cnpj_normalizado}.")
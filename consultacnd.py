@@ -0,0 +1,136 @@
+"""
+Ponto de entrada das rotinas da consulta de CND.
+
+Uso:
+    python consultacnd.py consulta [--planilha ARQUIVO] [--cnpjs CNPJ ...] [--limite N] [--delta] [--formatos-extras csv parquet]
+    python consultacnd.py renomear-pastas [--ano ANO] [--pasta PASTA] [--planilha ARQUIVO] [--simular | --desfazer]
+    python consultacnd.py init-db [--banco NOME]
+    python consultacnd.py historico [--cnpjs CNPJ ...] [--inicio AAAA-MM-DD] [--fim AAAA-MM-DD] [--colunas COLUNA ...]
+    python consultacnd.py tempo-inicializacao
+
+Os módulos de cada comando (pandas, SQLAlchemy, requests...) só são importados quando o
+comando é executado, para que a ajuda e os comandos leves iniciem rápido.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# Orçamento de inicialização, em segundos: a própria CLI e a importação de cada módulo (sem E/S)
+ORCAMENTO_CLI_SEGUNDOS = 0.5
+ORCAMENTO_IMPORTACAO_SEGUNDOS = 2.0
+MODULOS_MEDIDOS = [
+    "banco", "service", "controller", "arquivo", "consulta_cnd",
+    "executar_consulta", "mudanca_nome_pastas", "renovacao_certidoes", "fila_consultas",
+    "historico_certidoes", "exportacao_planilha",
+]
+
+
+def comando_consulta(opcoes):
+    from executar_consulta import executar_consulta
+    executar_consulta(opcoes.planilha, opcoes.cnpjs, opcoes.limite, opcoes.delta, opcoes.formatos_extras)
+
+
+def comando_renomear_pastas(opcoes):
+    from datetime import datetime
+    from arquivo import ler_planilhas_e_extrair_cnpjs, localizar_arquivo_excel
+    from mudanca_nome_pastas import PASTA_PLANILHAS_AVANTSEC, desfazer_renomeacoes, pasta_cnds, renomear_pastas
+
+    pasta = opcoes.pasta or pasta_cnds(opcoes.ano or datetime.now().year)
+    if opcoes.desfazer:
+        desfazer_renomeacoes(pasta, opcoes.max_renomeacoes)
+        return
+    arquivo_excel = opcoes.planilha or localizar_arquivo_excel(PASTA_PLANILHAS_AVANTSEC)
+    df_empresas = ler_planilhas_e_extrair_cnpjs(arquivo_excel, sheet1_header=2, sheet2_header=1)
+    renomear_pastas(pasta, df_empresas, simular=opcoes.simular, max_renomeacoes=opcoes.max_renomeacoes)
+
+
+def comando_init_db(opcoes):
+    from service import inicializar_banco
+    inicializar_banco(opcoes.banco)
+
+
+def comando_historico(opcoes):
+    from historico_certidoes import ler_historico
+    df = ler_historico(opcoes.colunas, opcoes.inicio, opcoes.fim, opcoes.cnpjs)
+    if opcoes.saida:
+        df.to_csv(opcoes.saida, index=False)
+        print(f"{len(df)} registros salvos em: {opcoes.saida}")
+    else:
+        print(df.to_string(index=False))
+
+
+def _medir(rotulo: str, comando: list, orcamento: float) -> bool:
+    inicio = time.perf_counter()
+    processo = subprocess.run(comando, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    duracao = time.perf_counter() - inicio
+
+    problemas = []
+    if processo.returncode != 0:
+        problemas.append(f"erro: {processo.stderr.strip().splitlines()[-1] if processo.stderr.strip() else processo.returncode}")
+    if duracao > orcamento:
+        problemas.append(f"acima do orçamento de {orcamento:.1f} s")
+    if processo.stdout and rotulo.startswith("import"):
+        problemas.append("efeito colateral na importação (saída no console)")
+    print(f"{rotulo:<35} {duracao:6.3f} s  {'; '.join(problemas) or 'ok'}")
+    return not problemas
+
+
+def comando_tempo_inicializacao(opcoes):
+    """Mede, em interpretadores novos, a partida da CLI e a importação de cada módulo."""
+    resultados = [_medir("consultacnd --help", [sys.executable, os.path.abspath(__file__), "--help"],
+                         ORCAMENTO_CLI_SEGUNDOS)]
+    for modulo in MODULOS_MEDIDOS:
+        resultados.append(_medir(f"import {modulo}", [sys.executable, "-c", f"import {modulo}"],
+                                 ORCAMENTO_IMPORTACAO_SEGUNDOS))
+    if not all(resultados):
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="consultacnd", description="Rotinas da consulta de CND na Infosimples.")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    parser_consulta = subparsers.add_parser("consulta", help="Executa o lote de consultas da planilha de controle.")
+    parser_consulta.add_argument("--planilha", help="Planilha de controle (padrão: a da segunda-feira mais recente).")
+    parser_consulta.add_argument("--cnpjs", nargs="+", help="Consulta apenas estes CNPJs.")
+    parser_consulta.add_argument("--limite", type=int, help="Quantidade máxima de CNPJs consultados.")
+    parser_consulta.add_argument("--delta", action="store_true",
+                                 help="Consulta só o que mudou desde a última execução concluída.")
+    parser_consulta.add_argument("--formatos-extras", nargs="+", choices=["csv", "parquet"],
+                                 help="Grava também a planilha de controle nestes formatos.")
+    parser_consulta.set_defaults(funcao=comando_consulta)
+
+    parser_renomear = subparsers.add_parser("renomear-pastas", help="Renomeia as pastas dos CNPJs para o nome da empresa.")
+    parser_renomear.add_argument("--ano", type=int, help="Ano da pasta de CNDs (padrão: o atual).")
+    parser_renomear.add_argument("--pasta", help="Pasta com as pastas dos CNPJs (substitui --ano).")
+    parser_renomear.add_argument("--planilha", help="Planilha de controle (padrão: a da segunda-feira mais recente).")
+    modo_renomear = parser_renomear.add_mutually_exclusive_group()
+    modo_renomear.add_argument("--simular", action="store_true", help="Mostra o plano sem renomear nada.")
+    modo_renomear.add_argument("--desfazer", action="store_true", help="Desfaz a última renomeação registrada na pasta.")
+    parser_renomear.add_argument("--max-renomeacoes", type=int, default=4, help="Renomeações simultâneas.")
+    parser_renomear.set_defaults(funcao=comando_renomear_pastas)
+
+    parser_init_db = subparsers.add_parser("init-db", help="Cria o banco, as tabelas e os índices.")
+    parser_init_db.add_argument("--banco", default="db_consultacnd")
+    parser_init_db.set_defaults(funcao=comando_init_db)
+
+    parser_historico = subparsers.add_parser("historico", help="Consulta o histórico de certidões em Parquet.")
+    parser_historico.add_argument("--cnpjs", nargs="+", help="CNPJs normalizados (só dígitos).")
+    parser_historico.add_argument("--inicio", help="Primeira data de consulta (AAAA-MM-DD).")
+    parser_historico.add_argument("--fim", help="Última data de consulta (AAAA-MM-DD).")
+    parser_historico.add_argument("--colunas", nargs="+",
+                                  default=["normalizado_cnpj", "razao_social", "situacao", "validade", "data_consulta_api"])
+    parser_historico.add_argument("--saida", help="Salva o resultado em CSV em vez de exibir.")
+    parser_historico.set_defaults(funcao=comando_historico)
+
+    parser_tempo = subparsers.add_parser("tempo-inicializacao", help="Mede a inicialização e compara com o orçamento.")
+    parser_tempo.set_defaults(funcao=comando_tempo_inicializacao)
+
+    opcoes = parser.parse_args()
+    opcoes.funcao(opcoes)
+
+
+if __name__ == "__main__":
+    main()
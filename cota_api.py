@@ -0,0 +1,156 @@
+import threading
+import time
+
+from collections import Counter
+
+from agendador_retentativas import FalhaConsulta, FALHA_COTA
+
+# Cota compartilhada da Infosimples (uma linha da tabela cota_api para todos os processos)
+NOME_COTA = "infosimples"
+CONSULTAS_POR_SEGUNDO = 2.0
+RAJADA_CONSULTAS = 8
+
+# Orçamento de consultas pagas (tentativas incluídas); None desativa o limite
+LIMITE_DIARIO_CONSULTAS = 3000
+LIMITE_MENSAL_CONSULTAS = 40000
+
+# Custo estimado por consulta respondida pela API (ajustar conforme o contrato); falhas de rede
+# e JSON inválido, sem código de resposta, são contadas com custo zero
+CUSTO_POR_CONSULTA = 0.20
+CUSTO_POR_CODIGO = {}
+
+# Consultas acumuladas em memória antes de gravar o consumo no banco
+CONSULTAS_POR_GRAVACAO = 50
+ESPERA_MAXIMA_FICHA_SEGUNDOS = 5.0
+
+# Erros do banco ao reservar a cota (conexão caída, pool esgotado): novas tentativas com espera
+# crescente antes de adiar o CNPJ; só o fim do orçamento encerra as consultas da execução
+TENTATIVAS_RESERVA_COTA = 4
+ESPERA_ERRO_RESERVA_SEGUNDOS = 2.0
+
+
+class GovernadorCota():
+    """
+    Controla as consultas pagas à Infosimples de todos os processos pelo banco.
+
+    Antes de cada chamada à API é reservada uma ficha do balde compartilhado (taxa global,
+    não por processo) e uma unidade do orçamento diário e mensal. Quando o orçamento acaba,
+    o governador passa a recusar as reservas com FalhaConsulta(FALHA_COTA): as consultas em
+    andamento terminam normalmente e os CNPJs recusados ficam como não concluídos no diário
+    (ou voltam para a fila), para serem retomados na próxima execução. Um erro do banco ao
+    reservar é repetido com espera crescente; persistindo, só o CNPJ da vez é adiado.
+
+    As respostas são contadas por código e gravadas em consumo_api, com o custo estimado.
+
+    Parâmetros:
+        control (dbController): Acesso ao banco.
+        execucao (str): Identificação da execução (ou do worker) no consumo.
+        consultas_por_segundo (float): Taxa global de consultas.
+        rajada (int): Consultas que podem ser feitas de uma vez após um período ocioso.
+        limite_diario (int): Consultas pagas por dia, somando todos os processos.
+        limite_mensal (int): Consultas pagas por mês, somando todos os processos.
+    """
+
+    def __init__(self, control, execucao: str, consultas_por_segundo: float = CONSULTAS_POR_SEGUNDO,
+                 rajada: int = RAJADA_CONSULTAS, limite_diario: int = LIMITE_DIARIO_CONSULTAS,
+                 limite_mensal: int = LIMITE_MENSAL_CONSULTAS, nome: str = NOME_COTA):
+        self.control = control
+        self.execucao = execucao
+        self.consultas_por_segundo = consultas_por_segundo
+        self.rajada = rajada
+        self.limite_diario = limite_diario
+        self.limite_mensal = limite_mensal
+        self.nome = nome
+        self.motivo_parada = None
+        self.interrompidos = set()  # CNPJs recusados por falta de cota
+        self._lock = threading.Lock()
+        self._pendente = Counter()  # Respostas ainda não gravadas no banco
+        self._total = Counter()  # Respostas da execução inteira
+
+    @property
+    def esgotada(self) -> bool:
+        return self.motivo_parada is not None
+
+    def _adiar(self, cnpj: str):
+        # Banco indisponível: o CNPJ fica pendente, mas a execução continua tentando os demais
+        with self._lock:
+            self.interrompidos.add(cnpj)
+        raise FalhaConsulta(FALHA_COTA, f"Consulta de {cnpj} adiada: cota indisponível (erro no banco).")
+
+    def _parar(self, motivo: str, cnpj: str):
+        with self._lock:
+            if self.motivo_parada is None:
+                self.motivo_parada = motivo
+                print(f"Cota da API: {motivo}. Nenhuma nova consulta será feita nesta execução.")
+            self.interrompidos.add(cnpj)
+        raise FalhaConsulta(FALHA_COTA, f"Consulta de {cnpj} não realizada: {motivo}.")
+
+    def aguardar(self, cnpj: str):
+        """
+        Bloqueia até haver uma ficha na cota compartilhada e a reserva.
+
+        Lança:
+            FalhaConsulta: Com a categoria FALHA_COTA quando o orçamento acabou ou o banco
+            continuou indisponível após as novas tentativas.
+        """
+        erros = 0
+        while True:
+            if self.esgotada:
+                self._parar(self.motivo_parada, cnpj)
+
+            reserva = self.control.reservar_cota(self.nome, self.consultas_por_segundo, self.rajada,
+                                                 self.limite_diario, self.limite_mensal)
+            if reserva is None:
+                erros += 1
+                if erros >= TENTATIVAS_RESERVA_COTA:
+                    self._adiar(cnpj)
+                time.sleep(ESPERA_ERRO_RESERVA_SEGUNDOS * 2 ** (erros - 1))
+                continue
+            situacao, espera = reserva
+            if situacao == 'ok':
+                return
+            if situacao == 'limite_diario':
+                self._parar(f"limite diário de {self.limite_diario} consultas atingido", cnpj)
+            if situacao == 'limite_mensal':
+                self._parar(f"limite mensal de {self.limite_mensal} consultas atingido", cnpj)
+            time.sleep(min(espera, ESPERA_MAXIMA_FICHA_SEGUNDOS))
+
+    def registrar(self, codigo):
+        """Conta uma consulta feita pelo código de resposta (ou a categoria da falha, sem resposta)."""
+        with self._lock:
+            self._pendente[codigo] += 1
+            self._total[codigo] += 1
+            gravar = sum(self._pendente.values()) >= CONSULTAS_POR_GRAVACAO
+        if gravar:
+            self.gravar()
+
+    def _consumo(self, contagem: Counter) -> dict:
+        return {codigo: (quantidade, round(quantidade * _custo(codigo), 2)) for codigo, quantidade in contagem.items()}
+
+    def gravar(self):
+        """Grava no banco o consumo acumulado desde a última gravação."""
+        with self._lock:
+            pendente, self._pendente = self._pendente, Counter()
+        self.control.registrar_consumo(self.execucao, self._consumo(pendente))
+
+    def resumo(self) -> dict:
+        """Consumo da execução: {código: (quantidade, custo estimado)}."""
+        with self._lock:
+            return self._consumo(self._total)
+
+    def fechar(self):
+        """Grava o consumo pendente e mostra o resumo da execução."""
+        self.gravar()
+        resumo = self.resumo()
+        total = sum(quantidade for quantidade, _ in resumo.values())
+        custo = sum(custo for _, custo in resumo.values())
+        print(f"Consumo da API em {self.execucao}: {total} consultas, custo estimado R$ {custo:.2f} {dict(resumo)}")
+        if self.interrompidos:
+            motivo = self.motivo_parada or "cota indisponível por erro no banco"
+            print(f"{len(self.interrompidos)} CNPJs ficaram para a próxima execução ({motivo}).")
+
+
+def _custo(codigo) -> float:
+    if codigo in CUSTO_POR_CODIGO:
+        return CUSTO_POR_CODIGO[codigo]
+    return CUSTO_POR_CONSULTA if isinstance(codigo, int) else 0.0
@@ -0,0 +1,120 @@
+import json
+import os
+import sqlite3
+import threading
+
+from datetime import datetime
+
+# Estados possíveis de cada CNPJ dentro de uma execução
+PENDENTE = "pendente"
+API_OK = "api_ok"
+PDF_SALVO = "pdf_salvo"
+PERSISTIDO = "persistido"
+FALHA = "falha"
+
+# Diário local (fora do drive compartilhado) para que a gravação seja rápida
+CAMINHO_DIARIO = os.path.join(os.path.expanduser("~"), ".consultacnd", "diario_execucao.sqlite3")
+
+
+class DiarioExecucao():
+    """
+    Diário persistente (SQLite) do andamento de uma execução da consulta.
+
+    Registra o estado de cada CNPJ e a resposta da API, permitindo que uma
+    execução interrompida seja retomada apenas com os CNPJs não concluídos,
+    sem pagar novamente pelas consultas que já tinham resposta.
+    """
+
+    def __init__(self, id_execucao: str, caminho: str = CAMINHO_DIARIO):
+        self.id_execucao = id_execucao
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        # WAL com synchronous=NORMAL: cada registro custa uma escrita sequencial, sem fsync por CNPJ
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS diario_execucao (
+                id_execucao TEXT NOT NULL,
+                cnpj TEXT NOT NULL,
+                estado TEXT NOT NULL,
+                payload TEXT,
+                atualizado_em TEXT NOT NULL,
+                PRIMARY KEY (id_execucao, cnpj)
+            )
+        """)
+
+    def iniciar(self, cnpjs):
+        """Registra os CNPJs da execução como pendentes, preservando os que já tinham estado."""
+        agora = datetime.now().isoformat()
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO diario_execucao (id_execucao, cnpj, estado, atualizado_em) VALUES (?, ?, ?, ?)",
+                [(self.id_execucao, cnpj, PENDENTE, agora) for cnpj in cnpjs],
+            )
+
+    def registrar(self, cnpj: str, estado: str, payload: dict = None):
+        """Atualiza o estado de um CNPJ. O payload, quando informado, substitui o anterior."""
+        with self._lock:
+            self.conn.execute(
+                """
+                INSERT INTO diario_execucao (id_execucao, cnpj, estado, payload, atualizado_em)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (id_execucao, cnpj) DO UPDATE SET
+                    estado = excluded.estado,
+                    payload = COALESCE(excluded.payload, diario_execucao.payload),
+                    atualizado_em = excluded.atualizado_em
+                """,
+                (self.id_execucao, cnpj, estado,
+                 json.dumps(payload, ensure_ascii=False) if payload is not None else None,
+                 datetime.now().isoformat()),
+            )
+
+    def registrar_varios(self, cnpjs, estado: str):
+        """Atualiza o estado de vários CNPJs em uma única transação."""
+        agora = datetime.now().isoformat()
+        with self._lock:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                "UPDATE diario_execucao SET estado = ?, atualizado_em = ? WHERE id_execucao = ? AND cnpj = ?",
+                [(estado, agora, self.id_execucao, cnpj) for cnpj in cnpjs],
+            )
+            self.conn.execute("COMMIT")
+
+    def nao_concluidos(self) -> set:
+        """Retorna os CNPJs da execução que ainda não foram gravados no banco."""
+        with self._lock:
+            linhas = self.conn.execute(
+                "SELECT cnpj FROM diario_execucao WHERE id_execucao = ? AND estado <> ?",
+                (self.id_execucao, PERSISTIDO),
+            ).fetchall()
+        return {cnpj for (cnpj,) in linhas}
+
+    def payload_salvo(self, cnpj: str):
+        """Retorna a resposta da API já registrada para o CNPJ (estados api_ok/pdf_salvo), ou None."""
+        with self._lock:
+            linha = self.conn.execute(
+                "SELECT payload FROM diario_execucao WHERE id_execucao = ? AND cnpj = ? AND estado IN (?, ?)",
+                (self.id_execucao, cnpj, API_OK, PDF_SALVO),
+            ).fetchone()
+        if linha and linha[0]:
+            return json.loads(linha[0])
+        return None
+
+    def encerrar(self):
+        """
+        Encerra a execução concluída: remove os CNPJs gravados no banco e os sem resposta da API.
+
+        Uma nova execução com a mesma planilha volta a consultar todos eles; só as respostas já
+        pagas e ainda não gravadas (api_ok/pdf_salvo) continuam no diário para serem reaproveitadas.
+        """
+        with self._lock:
+            self.conn.execute(
+                "DELETE FROM diario_execucao WHERE id_execucao = ? AND NOT (estado IN (?, ?) AND payload IS NOT NULL)",
+                (self.id_execucao, API_OK, PDF_SALVO),
+            )
+        self.fechar()
+
+    def fechar(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,250 @@
+import argparse
+import os
+import time
+import pandas as pd
+
+from datetime import datetime
+
+from arquivo import ler_planilhas_e_extrair_cnpjs, localizar_arquivo_excel, normalizar_cnpj
+from controller import dbController
+from executor import LimitadorTaxaPorHost
+from cliente_http import obter_sessao
+from cache_certidoes import MARGEM_VALIDADE_DIAS, separar_certidoes_validas, separar_delta
+from cache_certidoes import RESULTADO_SUCESSO, RESULTADO_FALHA, RESULTADO_CACHE, RESULTADO_PENDENTE
+from diario_execucao import DiarioExecucao, PERSISTIDO, FALHA
+from pipeline import PipelineConsulta
+from agendador_retentativas import AgendadorRetentativas, PoliticaRetentativa
+from consulta_cnd import ConsultaCND, URL_API, limpar_e_tratar_dados
+from baixador_pdfs import BaixadorPDFs
+from metricas import ColetorMetricas
+from historico_certidoes import gravar_historico
+from exportacao_planilha import ExportadorPlanilha, FORMATOS_EXTRAS
+from cota_api import GovernadorCota
+
+# Token da Infosimples
+TOKEN = ""
+
+# Limites de concorrência: consultas simultâneas e requisições por segundo em cada host
+MAX_CONSULTAS_SIMULTANEAS = 8
+WORKERS_DOWNLOAD = 4
+TAMANHO_LOTE_GRAVACAO = 50  # Resultados gravados no banco e na planilha a cada lote
+REQUISICOES_POR_SEGUNDO_POR_HOST = 2.0
+MAX_TENTATIVAS = 3
+
+# Pasta com as planilhas semanais de controle (origem dos CNPJs)
+PASTA_PLANILHAS_AVANTSEC = r"G:\Drives compartilhados\Operacional\19 - AUTOMAÇAO\RPA\TIME INTERNO AUTOMAÇÃO\PLANILHA AVANTSEC"
+
+# Métricas da execução: relatório JSON local e arquivo .prom lido pelo textfile collector do node exporter
+PASTA_RELATORIOS = os.path.join(os.path.expanduser("~"), ".consultacnd", "relatorios")
+CAMINHO_PROMETHEUS = os.path.join(os.path.expanduser("~"), ".consultacnd", "node_exporter", "consultacnd.prom")
+
+
+def pasta_destino_pdfs(ano: int) -> str:
+    """Pasta fixa onde ficam as subpastas das empresas com os PDFs do ano."""
+    return fr"G:\Drives compartilhados\Operacional\12 - CONTROLES\CND\{ano}"
+
+
+def criar_consulta(pasta_destino: str, data_consulta: datetime, metricas: ColetorMetricas,
+                   diario: DiarioExecucao = None, governador: GovernadorCota = None) -> ConsultaCND:
+    """Monta as etapas de consulta e download com os limites de concorrência e a política de retentativas."""
+    limitador = LimitadorTaxaPorHost(REQUISICOES_POR_SEGUNDO_POR_HOST, rajada=MAX_CONSULTAS_SIMULTANEAS)
+
+    # Retentativas em segundo plano com espera exponencial, alternando "nova" e "2via"
+    politica_retentativa = PoliticaRetentativa(max_tentativas=MAX_TENTATIVAS, preferencias=("nova", "2via"))
+
+    # Sessão HTTP compartilhada (keep-alive) para a API e para o host dos PDFs (site_receipt)
+    sessao = obter_sessao(
+        {"https://api.infosimples.com": MAX_CONSULTAS_SIMULTANEAS},
+        pool_padrao=MAX_CONSULTAS_SIMULTANEAS,
+    )
+
+    # Downloads de PDF limitados a WORKERS_DOWNLOAD simultâneos, com retomada e escrita atômica
+    baixador = BaixadorPDFs(sessao, limitador, max_downloads=WORKERS_DOWNLOAD)
+
+    # Etapas de consulta e download compartilhadas com o benchmark
+    return ConsultaCND(
+        TOKEN, pasta_destino, url=URL_API, sessao=sessao, limitador=limitador,
+        diario=diario, politica=politica_retentativa, data_consulta=data_consulta, metricas=metricas,
+        baixador=baixador, governador=governador,
+    )
+
+
+def consultar_cnpjs(consulta: ConsultaCND, control: dbController, df_cnpjs: pd.DataFrame, ao_gravar=None) -> list:
+    """
+    Consulta os CNPJs em estágios (API → PDF → gravação em lotes no banco).
+
+    Parâmetros:
+        consulta (ConsultaCND): Etapas de consulta, como criadas por criar_consulta.
+        control (dbController): Destino dos resultados.
+        df_cnpjs (pd.DataFrame): Empresas a consultar, com as colunas 'CNPJ' e 'EMPRESA'.
+        ao_gravar (callable): Chamado com o DataFrame de cada lote gravado.
+
+    Retorna:
+        list: CNPJs normalizados que falharam em definitivo, inclusive os dos lotes que não
+        puderam ser gravados no banco. Os que não foram consultados por falta de cota
+        (consulta.governador.interrompidos) não entram: continuam pendentes.
+    """
+    diario = consulta.diario
+    metricas = consulta.metricas
+    falhas_gravacao = []  # CNPJs dos lotes que o banco recusou
+
+    # Estágio de gravação: chamado pela thread de gravação a cada lote de resultados
+    def gravar_lote(lote: list):
+        df_lote = pd.DataFrame([registro for registros in lote for registro in registros])
+        with metricas.medir('limpeza'):
+            df_lote = limpar_e_tratar_dados(df_lote, consulta.data_consulta)
+
+        with metricas.medir('gravacao_db'):
+            gravado = control.inserir_dados(df_lote, "df_consultacnd")  # Tabela onde você deseja armazenar os dados
+        if not gravado:
+            # Sem gravação no banco o resultado se perde: o lote volta como falha para ser refeito
+            falhas_gravacao.extend(df_lote['cnpj_consultado'].unique().tolist())
+            return
+        if diario:
+            diario.registrar_varios(df_lote['cnpj_consultado'].unique().tolist(), PERSISTIDO)
+        if ao_gravar:
+            ao_gravar(df_lote)
+
+    # Processando os CNPJs em estágios: consulta → download do PDF → gravação em lotes
+    pipeline = PipelineConsulta(
+        consulta.processar_cnpj, consulta.baixar_certidao, gravar_lote,
+        workers_busca=MAX_CONSULTAS_SIMULTANEAS, workers_download=WORKERS_DOWNLOAD, tamanho_lote=TAMANHO_LOTE_GRAVACAO,
+        agendador=AgendadorRetentativas(consulta.politica),
+    )
+    falhas = pipeline.executar(zip(df_cnpjs['CNPJ'], df_cnpjs['EMPRESA']))
+    falhas_download = [falha["cnpj"] if isinstance(falha, dict) else normalizar_cnpj(falha[0]) for falha in falhas]
+    if consulta.governador:
+        falhas_download = [cnpj for cnpj in falhas_download if cnpj not in consulta.governador.interrompidos]
+    if diario:
+        for cnpj_falha in falhas_download:
+            diario.registrar(cnpj_falha, FALHA)
+    # Lotes recusados pelo banco continuam como pdf_salvo no diário: a nova tentativa reaproveita a resposta paga
+    falhas_download += sorted(set(falhas_gravacao) - set(falhas_download))
+    if falhas_download:
+        print(f"CNPJs com falha: {falhas_download}")
+    return falhas_download
+
+
+def executar_consulta(arquivo_excel: str = None, cnpjs: list = None, limite: int = None,
+                      delta: bool = False, formatos_extras: list = None) -> pd.DataFrame:
+    """
+    Executa o lote de consultas de CND da planilha semanal e grava os resultados.
+
+    Parâmetros:
+        arquivo_excel (str): Planilha de controle (padrão: a da segunda-feira mais recente).
+        cnpjs (list): Restringe a execução a estes CNPJs (útil para testes).
+        limite (int): Quantidade máxima de CNPJs consultados.
+        delta (bool): Consulta apenas os CNPJs novos, os que falharam na última execução
+            concluída e os com certidão perto do vencimento.
+        formatos_extras (list): Cópias da planilha de controle em "csv" e/ou "parquet".
+
+    Retorna:
+        pd.DataFrame: Resultados gravados nesta execução (vazio se nenhum).
+    """
+    start = time.time()
+    data_atual = datetime.now()
+    control = dbController()
+    metricas = ColetorMetricas()
+
+    # Caminho fixo para salvar os PDFs e subpasta de planilhas
+    pasta_destino = pasta_destino_pdfs(data_atual.year)
+    os.makedirs(pasta_destino, exist_ok=True)
+    pasta_planilhas = os.path.join(pasta_destino, "planilhas_controle")
+    os.makedirs(pasta_planilhas, exist_ok=True)
+
+    # Nome do arquivo Excel e extração da lista de CNPJs
+    arquivo_excel = arquivo_excel or localizar_arquivo_excel(PASTA_PLANILHAS_AVANTSEC)
+    df_cnpjs = ler_planilhas_e_extrair_cnpjs(arquivo_excel)
+    if len(df_cnpjs) == 0:
+        # Planilha ilegível ou sem CNPJs válidos: nenhuma execução é registrada
+        print(f"Nenhum CNPJ para consultar na planilha {arquivo_excel}.")
+        return pd.DataFrame()
+    if cnpjs:
+        df_cnpjs = df_cnpjs[df_cnpjs['CNPJ'].isin(cnpjs)]
+
+    id_execucao = control.iniciar_execucao(os.path.basename(arquivo_excel))
+    cnpjs_planilha = df_cnpjs['CNPJ'].tolist()
+
+    # Pular CNPJs cuja última certidão no banco ainda é válida além da margem de segurança
+    df_certidoes = control.ler_ultimas_certidoes(cnpjs_planilha)
+    if delta:
+        # Comparação com a última execução concluída: só os novos, os que falharam e os perto do vencimento
+        df_cnpjs, df_em_cache, removidos = separar_delta(
+            df_cnpjs, control.ler_ultima_execucao(), df_certidoes, MARGEM_VALIDADE_DIAS,
+        )
+        if removidos:
+            print(f"CNPJs removidos desde a última execução: {removidos}")
+    else:
+        df_cnpjs, df_em_cache = separar_certidoes_validas(df_cnpjs, df_certidoes, MARGEM_VALIDADE_DIAS)
+
+    # Diário da execução, identificado pela planilha semanal: ao reiniciar, só os CNPJs não concluídos são processados
+    diario = DiarioExecucao(os.path.basename(arquivo_excel))
+    diario_cnpjs = df_cnpjs['CNPJ'].tolist()
+    diario.iniciar(diario_cnpjs)
+    df_cnpjs = df_cnpjs[df_cnpjs['CNPJ'].isin(diario.nao_concluidos())]
+    if limite:
+        df_cnpjs = df_cnpjs.head(limite)
+
+    # Planilha de controle gravada em fluxo a cada lote (arquivo local) e enviada ao drive ao final
+    resultados = []
+    nome_arquivo_excel = os.path.join(pasta_planilhas, f"PLANILHA DE CONTROLE - {data_atual.strftime('%Y-%m-%d_%H-%M-%S')}.xlsx")
+
+    # Cota de consultas pagas compartilhada com as outras execuções e workers
+    governador = GovernadorCota(control, execucao=f"execucao-{id_execucao}")
+    consulta = criar_consulta(pasta_destino, data_atual, metricas, diario, governador)
+    with ExportadorPlanilha(nome_arquivo_excel, formatos_extras=formatos_extras) as exportador:
+        def exportar_lote(df_lote: pd.DataFrame):
+            resultados.append(df_lote)
+            with metricas.medir('exportacao'):
+                exportador.adicionar(df_lote)
+
+        consultar_cnpjs(consulta, control, df_cnpjs, ao_gravar=exportar_lote)
+    governador.fechar()
+    df_resultados = pd.concat(resultados, ignore_index=True) if resultados else pd.DataFrame()
+
+    # Histórico em Parquet (ano/mês) para análises entre execuções sem abrir as planilhas
+    with metricas.medir('historico'):
+        gravar_historico(df_resultados)
+
+    # Resultado de cada CNPJ da planilha, base para o próximo modo delta
+    consultados = set(df_cnpjs['CNPJ'])
+    nao_concluidos = diario.nao_concluidos()
+    resultados_execucao = {cnpj: RESULTADO_CACHE for cnpj in cnpjs_planilha}
+    for cnpj in diario_cnpjs:
+        if cnpj not in nao_concluidos:
+            resultados_execucao[cnpj] = RESULTADO_SUCESSO
+        elif cnpj in consultados and cnpj not in governador.interrompidos:
+            resultados_execucao[cnpj] = RESULTADO_FALHA
+        else:
+            resultados_execucao[cnpj] = RESULTADO_PENDENTE
+    # Execuções restritas a alguns CNPJs não servem de base para o modo delta
+    control.concluir_execucao(id_execucao, resultados_execucao, status='parcial' if cnpjs else 'concluida')
+    # Execução concluída: uma nova execução com a mesma planilha não pula os CNPJs já gravados
+    diario.encerrar()
+
+    end = time.time()
+    tempo = end - start
+    print(f"Tempo de execução: {tempo:.2f} segundos")
+
+    metricas.salvar_json(os.path.join(PASTA_RELATORIOS, f"execucao_{data_atual.strftime('%Y-%m-%d_%H-%M-%S')}.json"))
+    metricas.salvar_prometheus(CAMINHO_PROMETHEUS)
+
+    return df_resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Executa o lote de consultas de CND na Infosimples.")
+    parser.add_argument("--planilha", help="Planilha de controle (padrão: a da segunda-feira mais recente).")
+    parser.add_argument("--cnpjs", nargs="+", help="Consulta apenas estes CNPJs.")
+    parser.add_argument("--limite", type=int, help="Quantidade máxima de CNPJs consultados.")
+    parser.add_argument("--delta", action="store_true",
+                        help="Consulta só o que mudou desde a última execução concluída.")
+    parser.add_argument("--formatos-extras", nargs="+", choices=FORMATOS_EXTRAS,
+                        help="Grava também a planilha de controle nestes formatos.")
+    opcoes = parser.parse_args()
+
+    executar_consulta(opcoes.planilha, opcoes.cnpjs, opcoes.limite, opcoes.delta, opcoes.formatos_extras)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+
+class LimitadorTaxaPorHost():
+    """
+    Limita a quantidade de requisições por segundo enviadas a cada host.
+
+    Cada host tem o seu próprio balde de fichas (token bucket), de modo que o
+    limite da API da Infosimples não interfere no limite do servidor de PDFs.
+    É seguro para uso a partir de várias threads.
+    """
+
+    def __init__(self, requisicoes_por_segundo: float, rajada: int = 1):
+        self.requisicoes_por_segundo = requisicoes_por_segundo
+        self.rajada = max(1, rajada)
+        self._baldes = {}
+        self._lock = threading.Lock()
+
+    def aguardar(self, url: str):
+        """Bloqueia a thread atual até que haja uma ficha disponível para o host da URL."""
+        if not self.requisicoes_por_segundo:
+            return
+
+        host = urlparse(url).netloc
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                fichas, ultimo = self._baldes.get(host, (float(self.rajada), agora))
+                fichas = min(self.rajada, fichas + (agora - ultimo) * self.requisicoes_por_segundo)
+                if fichas >= 1:
+                    self._baldes[host] = (fichas - 1, agora)
+                    return
+                self._baldes[host] = (fichas, agora)
+                espera = (1 - fichas) / self.requisicoes_por_segundo
+            time.sleep(espera)
+
+
+def executar_em_paralelo(funcao, tarefas, max_workers: int = 8):
+    """
+    Executa `funcao` para cada tarefa em um pool limitado de threads.
+
+    Parâmetros:
+        funcao (callable): Função chamada como `funcao(*tarefa)`. Deve retornar
+            o resultado da tarefa ou None em caso de falha.
+        tarefas (iterable): Tuplas de argumentos, uma por execução.
+        max_workers (int): Número máximo de execuções simultâneas.
+
+    Retorna:
+        tuple: (resultados, falhas), onde `resultados` contém os retornos não
+        nulos e `falhas` contém as tarefas que retornaram None ou lançaram exceção.
+        As listas são preenchidas apenas pela thread chamadora.
+    """
+    resultados = []
+    falhas = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futuros = {pool.submit(funcao, *tarefa): tarefa for tarefa in tarefas}
+        for futuro in as_completed(futuros):
+            tarefa = futuros[futuro]
+            try:
+                resultado = futuro.result()
+            except Exception as e:
+                print(f"Erro inesperado ao processar a tarefa {tarefa}: {e}")
+                falhas.append(tarefa)
+                continue
+
+            if resultado is None:
+                falhas.append(tarefa)
+            else:
+                resultados.append(resultado)
+
+    return resultados, falhas
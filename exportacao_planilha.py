@@ -0,0 +1,234 @@
+import csv
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from service import ESQUEMA_DF_CONSULTACND
+
+# Formatos adicionais da planilha de controle para outras ferramentas
+FORMATOS_EXTRAS = ("csv", "parquet")
+
+FORMATO_DATA_EXCEL = "dd/mm/yyyy"
+LARGURA_COLUNA_PADRAO = 18
+LARGURA_COLUNA_DATA = 12
+
+
+def publicar_arquivo(temporario: str, destino: str):
+    """
+    Envia o arquivo local pronto para o destino (ex.: drive compartilhado) em uma única cópia.
+
+    A cópia vai para "<destino>.part" e só então é renomeada: quem abre o destino nunca
+    encontra um arquivo pela metade. O temporário é removido ao final.
+    """
+    pasta = os.path.dirname(destino)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    parcial = f"{destino}.part"
+    shutil.copyfile(temporario, parcial)
+    os.replace(parcial, destino)
+    os.remove(temporario)
+
+
+class ExportadorPlanilha():
+    """
+    Planilha de controle gravada em fluxo, lote a lote, com memória constante.
+
+    O xlsx é escrito com o xlsxwriter em modo constant_memory (cada linha vai para o disco
+    assim que escrita), em um arquivo temporário local; tipos e formatos das colunas são
+    definidos uma única vez no início. Sem o xlsxwriter instalado, é usado o openpyxl em
+    modo write_only, mais lento, mas também em fluxo. Ao fechar, o arquivo pronto é copiado para o destino
+    de uma só vez. Opcionalmente, o mesmo conteúdo é gravado em CSV e/ou Parquet ao lado do xlsx.
+
+    Uso:
+        with ExportadorPlanilha(destino) as exportador:
+            exportador.adicionar(df_lote)
+
+    Parâmetros:
+        destino (str): Caminho final do xlsx.
+        colunas (list): Colunas exportadas, na ordem (padrão: as do df_consultacnd).
+        formatos_extras (list): "csv" e/ou "parquet", gravados com o mesmo nome do xlsx.
+    """
+
+    def __init__(self, destino: str, colunas: list = None, formatos_extras: list = None):
+        self.destino = destino
+        self.colunas = colunas or [campo for campo, _, _ in ESQUEMA_DF_CONSULTACND]
+        self.formatos_extras = list(formatos_extras or [])
+        self.linhas = 0
+        tipos = {campo: tipo for campo, _, tipo in ESQUEMA_DF_CONSULTACND}
+        self._tipos = [tipos.get(coluna, 'texto') for coluna in self.colunas]
+
+        self._pasta_temporaria = tempfile.mkdtemp(prefix="consultacnd-exportacao-")
+        nome = os.path.splitext(os.path.basename(destino))[0]
+        self._temporarios = {"xlsx": os.path.join(self._pasta_temporaria, f"{nome}.xlsx")}
+
+        self._workbook_openpyxl = None
+        try:
+            import xlsxwriter  # Importado só quando a exportação é usada
+        except ImportError:
+            xlsxwriter = None
+
+        if xlsxwriter:
+            self._workbook = xlsxwriter.Workbook(self._temporarios["xlsx"], {"constant_memory": True})
+            self._planilha = self._workbook.add_worksheet()
+            formato_data = self._workbook.add_format({"num_format": FORMATO_DATA_EXCEL})
+            formato_cabecalho = self._workbook.add_format({"bold": True})
+            for indice, (coluna, tipo) in enumerate(zip(self.colunas, self._tipos)):
+                if tipo == 'data':
+                    self._planilha.set_column(indice, indice, LARGURA_COLUNA_DATA, formato_data)
+                else:
+                    self._planilha.set_column(indice, indice, LARGURA_COLUNA_PADRAO)
+                self._planilha.write_string(0, indice, coluna, formato_cabecalho)
+            self._formato_data = formato_data
+        else:
+            self._abrir_openpyxl()
+
+        self._csv = self._arquivo_csv = None
+        if "csv" in self.formatos_extras:
+            self._temporarios["csv"] = os.path.join(self._pasta_temporaria, f"{nome}.csv")
+            self._arquivo_csv = open(self._temporarios["csv"], "w", newline="", encoding="utf-8-sig")
+            self._csv = csv.writer(self._arquivo_csv, delimiter=";")
+            self._csv.writerow(self.colunas)
+
+        self._parquet = None
+        if "parquet" in self.formatos_extras:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            tipos_arrow = {'texto': pa.string(), 'data': pa.date32(), 'numero': pa.float64()}
+            self._esquema_parquet = pa.schema([(coluna, tipos_arrow[tipo]) for coluna, tipo in zip(self.colunas, self._tipos)])
+            self._temporarios["parquet"] = os.path.join(self._pasta_temporaria, f"{nome}.parquet")
+            self._parquet = pq.ParquetWriter(self._temporarios["parquet"], self._esquema_parquet)
+
+    def adicionar(self, df_lote: pd.DataFrame):
+        """Acrescenta um lote de resultados (como retornados por limpar_e_tratar_dados) ao final da planilha."""
+        df_lote = df_lote.reindex(columns=self.colunas)
+        for indice, tipo in enumerate(self._tipos):
+            coluna = self.colunas[indice]
+            if tipo == 'data':
+                df_lote[coluna] = pd.to_datetime(df_lote[coluna], errors='coerce')
+            elif tipo == 'numero':
+                df_lote[coluna] = pd.to_numeric(df_lote[coluna], errors='coerce')
+
+        if self._workbook_openpyxl:
+            self._adicionar_openpyxl(df_lote)
+        else:
+            planilha = self._planilha
+            for registro in df_lote.itertuples(index=False, name=None):
+                self.linhas += 1
+                for indice, (valor, tipo) in enumerate(zip(registro, self._tipos)):
+                    if pd.isna(valor):
+                        continue  # Célula vazia: nada a escrever
+                    if tipo == 'data':
+                        planilha.write_datetime(self.linhas, indice, valor.to_pydatetime(), self._formato_data)
+                    elif tipo == 'numero':
+                        planilha.write_number(self.linhas, indice, float(valor))
+                    else:
+                        planilha.write_string(self.linhas, indice, str(valor))
+
+        if self._csv:
+            df_csv = df_lote.copy()
+            for coluna, tipo in zip(self.colunas, self._tipos):
+                if tipo == 'data':
+                    df_csv[coluna] = df_csv[coluna].dt.strftime("%d/%m/%Y")
+            self._csv.writerows(df_csv.astype(object).where(df_csv.notna(), "").itertuples(index=False, name=None))
+
+        if self._parquet:
+            import pyarrow as pa
+
+            colunas = {}
+            for coluna, tipo in zip(self.colunas, self._tipos):
+                valores = df_lote[coluna]
+                if tipo == 'data':
+                    valores = valores.dt.date
+                elif tipo == 'texto':
+                    valores = valores.astype(object).where(valores.notna(), None)
+                    valores = valores.map(lambda valor: valor if valor is None else str(valor))
+                colunas[coluna] = pa.array(valores, type=self._esquema_parquet.field(coluna).type, from_pandas=True)
+            self._parquet.write_table(pa.Table.from_pydict(colunas, schema=self._esquema_parquet))
+
+    def _abrir_openpyxl(self):
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+        from openpyxl.utils import get_column_letter
+
+        print("xlsxwriter não instalado: a planilha de controle será gravada com o openpyxl (mais lento).")
+        self._workbook_openpyxl = Workbook(write_only=True)
+        self._planilha = self._workbook_openpyxl.create_sheet()
+        for indice, tipo in enumerate(self._tipos, start=1):
+            largura = LARGURA_COLUNA_DATA if tipo == 'data' else LARGURA_COLUNA_PADRAO
+            self._planilha.column_dimensions[get_column_letter(indice)].width = largura
+        cabecalho = []
+        for coluna in self.colunas:
+            celula = WriteOnlyCell(self._planilha, value=coluna)
+            celula.font = Font(bold=True)
+            cabecalho.append(celula)
+        self._planilha.append(cabecalho)
+        self._celula = WriteOnlyCell
+
+    def _adicionar_openpyxl(self, df_lote: pd.DataFrame):
+        planilha = self._planilha
+        for registro in df_lote.itertuples(index=False, name=None):
+            self.linhas += 1
+            linha = []
+            for valor, tipo in zip(registro, self._tipos):
+                if pd.isna(valor):
+                    linha.append(None)
+                elif tipo == 'data':
+                    celula = self._celula(planilha, value=valor.to_pydatetime())
+                    celula.number_format = FORMATO_DATA_EXCEL
+                    linha.append(celula)
+                elif tipo == 'numero':
+                    linha.append(float(valor))
+                else:
+                    linha.append(str(valor))
+            planilha.append(linha)
+
+    def fechar(self) -> list:
+        """
+        Finaliza os arquivos e os copia para a pasta de destino; sem nenhum registro, nada é publicado.
+
+        Retorna:
+            list: Caminhos dos arquivos publicados (o xlsx primeiro; vazia se não havia registros).
+        """
+        if self._workbook_openpyxl:
+            self._workbook_openpyxl.save(self._temporarios["xlsx"])
+        else:
+            self._workbook.close()
+        if self._arquivo_csv:
+            self._arquivo_csv.close()
+        if self._parquet:
+            self._parquet.close()
+
+        if self.linhas == 0:
+            # Nada consultado (ex.: modo delta sem mudanças): nenhuma planilha só com cabeçalho no drive
+            shutil.rmtree(self._pasta_temporaria, ignore_errors=True)
+            print("Nenhum resultado nesta execução: a planilha de controle não foi gerada.")
+            return []
+
+        base = os.path.splitext(self.destino)[0]
+        publicados = []
+        for formato, temporario in self._temporarios.items():
+            destino = self.destino if formato == "xlsx" else f"{base}.{formato}"
+            publicar_arquivo(temporario, destino)
+            publicados.append(destino)
+        shutil.rmtree(self._pasta_temporaria, ignore_errors=True)
+        print(f"Planilha com {self.linhas} registros salva em: {self.destino}")
+        return publicados
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_excecao, excecao, rastreamento):
+        # Publica também se a execução for interrompida: os lotes já gravados não se perdem
+        if tipo_excecao is None:
+            self.fechar()
+            return False
+        try:
+            self.fechar()
+        except Exception as e:
+            # Um erro ao publicar não pode esconder o erro que interrompeu a execução
+            print(f"Erro ao publicar a planilha de controle após uma interrupção: {e}")
+        return False
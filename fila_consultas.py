@@ -0,0 +1,165 @@
+import argparse
+import os
+import socket
+import threading
+import time
+import pandas as pd
+
+from datetime import datetime
+
+from arquivo import ler_planilhas_e_extrair_cnpjs, localizar_arquivo_excel
+from controller import dbController
+from cache_certidoes import MARGEM_VALIDADE_DIAS, separar_certidoes_validas
+from metricas import ColetorMetricas
+from historico_certidoes import gravar_historico
+from cota_api import GovernadorCota
+from executar_consulta import (
+    CAMINHO_PROMETHEUS, PASTA_PLANILHAS_AVANTSEC,
+    criar_consulta, consultar_cnpjs, pasta_destino_pdfs,
+)
+
+# Tarefas reservadas por vez, prazo da reserva e política de novas tentativas da fila
+TAMANHO_RESERVA = 50
+LEASE_SEGUNDOS = 600
+MAX_TENTATIVAS_FILA = 5
+ATRASO_FALHA_SEGUNDOS = 30 * 60
+ESPERA_FILA_VAZIA_SEGUNDOS = 30
+ESPERA_COTA_ESGOTADA_SEGUNDOS = 60 * 60  # Tarefas devolvidas quando a cota acaba
+
+
+def enfileirar_planilha(arquivo_excel: str = None, control: dbController = None) -> int:
+    """
+    Inclui na fila de consultas os CNPJs da planilha de controle sem certidão válida no banco.
+
+    Parâmetros:
+        arquivo_excel (str): Planilha de controle (padrão: a da segunda-feira mais recente).
+        control (dbController): Conexão com o banco (padrão: uma nova).
+
+    Retorna:
+        int: Quantidade de tarefas incluídas.
+    """
+    control = control or dbController()
+    arquivo_excel = arquivo_excel or localizar_arquivo_excel(PASTA_PLANILHAS_AVANTSEC)
+    df_cnpjs = ler_planilhas_e_extrair_cnpjs(arquivo_excel)
+    if len(df_cnpjs) == 0:
+        return 0
+
+    df_certidoes = control.ler_ultimas_certidoes(df_cnpjs['CNPJ'].tolist())
+    df_cnpjs, _ = separar_certidoes_validas(df_cnpjs, df_certidoes, MARGEM_VALIDADE_DIAS)
+    incluidas = control.enfileirar_consultas(df_cnpjs)
+    print(f"{incluidas} consultas incluídas na fila ({len(df_cnpjs) - incluidas} já estavam abertas).")
+    return incluidas
+
+
+class WorkerFila():
+    """
+    Processo que consome a fila de consultas do banco.
+
+    Qualquer número de workers, em uma ou mais máquinas, pode rodar ao mesmo tempo: cada
+    lote é reservado com FOR UPDATE SKIP LOCKED, de modo que um CNPJ nunca é entregue a dois
+    workers. Enquanto o lote é processado, uma thread renova o prazo da reserva; se o worker
+    morrer, o prazo expira e as tarefas voltam a ficar disponíveis para os demais.
+
+    Parâmetros:
+        control (dbController): Conexão com o banco, usada também para gravar os resultados.
+        worker (str): Identificação do worker (padrão: máquina e PID).
+        tamanho_reserva (int): Tarefas reservadas por vez.
+        lease_segundos (int): Prazo de cada reserva.
+    """
+
+    def __init__(self, control: dbController, worker: str = None, tamanho_reserva: int = TAMANHO_RESERVA,
+                 lease_segundos: int = LEASE_SEGUNDOS):
+        self.control = control
+        self.worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+        self.tamanho_reserva = tamanho_reserva
+        self.lease_segundos = lease_segundos
+        self.governador = GovernadorCota(control, execucao=self.worker)
+
+    def _renovar_periodicamente(self, ids: list, parar: threading.Event):
+        while not parar.wait(self.lease_segundos / 3):
+            self.control.renovar_reservas(self.worker, ids, self.lease_segundos)
+
+    def processar_lote(self) -> int:
+        """
+        Reserva e processa um lote da fila.
+
+        Retorna:
+            int: Quantidade de tarefas processadas (0 se a fila não tinha tarefas disponíveis).
+        """
+        df_tarefas = self.control.reservar_consultas(self.worker, self.tamanho_reserva, self.lease_segundos,
+                                                     MAX_TENTATIVAS_FILA)
+        if df_tarefas.empty:
+            return 0
+
+        # Os CNPJs adiados pelo governador são contados por lote
+        self.governador.interrompidos.clear()
+        ids = df_tarefas['id_tarefa'].tolist()
+        parar = threading.Event()
+        renovacao = threading.Thread(target=self._renovar_periodicamente, args=(ids, parar), daemon=True)
+        renovacao.start()
+        try:
+            agora = datetime.now()
+            metricas = ColetorMetricas()
+            consulta = criar_consulta(pasta_destino_pdfs(agora.year), agora, metricas, governador=self.governador)
+            resultados = []
+            falhas = set(consultar_cnpjs(consulta, self.control, df_tarefas, ao_gravar=resultados.append))
+            if resultados:
+                gravar_historico(pd.concat(resultados, ignore_index=True))
+            metricas.salvar_prometheus(CAMINHO_PROMETHEUS)
+        except Exception as e:
+            print(f"Erro no worker {self.worker} ao processar o lote: {e}")
+            falhas = set(df_tarefas['CNPJ'])
+        finally:
+            parar.set()
+            renovacao.join()
+
+        # Tarefas não consultadas por falta de cota (ou com o banco da cota indisponível) voltam para a fila
+        # sem contar tentativa
+        interrompidas = df_tarefas['CNPJ'].isin(self.governador.interrompidos)
+        espera = ESPERA_COTA_ESGOTADA_SEGUNDOS if self.governador.esgotada else ATRASO_FALHA_SEGUNDOS
+        self.control.liberar_consultas(self.worker, df_tarefas.loc[interrompidas, 'id_tarefa'].tolist(), espera)
+        com_falha = df_tarefas['CNPJ'].isin(falhas) & ~interrompidas
+        self.control.finalizar_consultas(
+            self.worker,
+            df_tarefas.loc[~com_falha & ~interrompidas, 'id_tarefa'].tolist(),
+            df_tarefas.loc[com_falha, 'id_tarefa'].tolist(),
+            MAX_TENTATIVAS_FILA, ATRASO_FALHA_SEGUNDOS,
+        )
+        print(f"Worker {self.worker}: {int((~com_falha & ~interrompidas).sum())} concluídas, "
+              f"{int(com_falha.sum())} com falha, {int(interrompidas.sum())} devolvidas à fila.")
+        return len(df_tarefas)
+
+    def executar(self, parar_quando_vazia: bool = False):
+        """Consome a fila continuamente; com `parar_quando_vazia`, encerra quando não houver tarefas disponíveis."""
+        print(f"Worker {self.worker} iniciado.")
+        while not self.governador.esgotada:
+            if self.processar_lote() == 0:
+                if parar_quando_vazia:
+                    break
+                time.sleep(ESPERA_FILA_VAZIA_SEGUNDOS)
+        self.governador.fechar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fila de consultas de CND distribuída entre workers.")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    parser_enfileirar = subparsers.add_parser("enfileirar", help="Inclui na fila os CNPJs da planilha de controle.")
+    parser_enfileirar.add_argument("--planilha", help="Planilha de controle (padrão: a da segunda-feira mais recente).")
+
+    parser_worker = subparsers.add_parser("worker", help="Consome a fila de consultas.")
+    parser_worker.add_argument("--tamanho-reserva", type=int, default=TAMANHO_RESERVA)
+    parser_worker.add_argument("--lease-segundos", type=int, default=LEASE_SEGUNDOS)
+    parser_worker.add_argument("--parar-quando-vazia", action="store_true")
+    opcoes = parser.parse_args()
+
+    control = dbController()
+    if opcoes.comando == "enfileirar":
+        enfileirar_planilha(opcoes.planilha, control)
+    else:
+        WorkerFila(control, tamanho_reserva=opcoes.tamanho_reserva,
+                   lease_segundos=opcoes.lease_segundos).executar(opcoes.parar_quando_vazia)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+import os
+import uuid
+
+from datetime import date, datetime
+
+import pandas as pd
+
+from arquivo import normalizar_cnpj
+from service import ESQUEMA_DF_CONSULTACND
+
+# Histórico local das consultas em Parquet, particionado por ano/mês de data_consulta_api
+# (ano=2024/mes=3/...): cada execução acrescenta seus arquivos sem reescrever os anteriores
+CAMINHO_HISTORICO = os.path.join(os.path.expanduser("~"), ".consultacnd", "historico")
+
+
+def _esquemas():
+    """
+    Esquema fixo do histórico, derivado do esquema do df_consultacnd; o pyarrow só é importado aqui.
+
+    Retorna:
+        tuple: (esquema das colunas gravadas nos arquivos, esquema das partições ano/mês, esquema completo).
+    """
+    import pyarrow as pa
+
+    tipos = {'texto': pa.string(), 'data': pa.date32(), 'numero': pa.float64()}
+    esquema_arquivos = pa.schema([(campo, tipos[tipo]) for campo, _, tipo in ESQUEMA_DF_CONSULTACND])
+    esquema_particoes = pa.schema([("ano", pa.int16()), ("mes", pa.int8())])
+    return esquema_arquivos, esquema_particoes, pa.unify_schemas([esquema_arquivos, esquema_particoes])
+
+
+def _tabela(df: pd.DataFrame):
+    """Converte os resultados limpos para o esquema do histórico, com as colunas de partição."""
+    import pyarrow as pa
+
+    esquema_arquivos, esquema_particoes, esquema_completo = _esquemas()
+    colunas = {}
+    for campo in esquema_arquivos.names:
+        tipo = esquema_arquivos.field(campo).type
+        valores = df[campo] if campo in df else pd.Series([None] * len(df), index=df.index)
+        if pa.types.is_date32(tipo):
+            valores = pd.to_datetime(valores, errors='coerce').dt.date
+        elif pa.types.is_string(tipo):
+            valores = valores.astype(object).where(valores.notna(), None)
+            valores = valores.map(lambda valor: valor if valor is None else str(valor))
+        else:
+            valores = pd.to_numeric(valores, errors='coerce')
+        colunas[campo] = pa.array(valores, type=tipo, from_pandas=True)
+
+    data_consulta = pd.to_datetime(df['data_consulta_api'])
+    colunas["ano"] = pa.array(data_consulta.dt.year, type=esquema_particoes.field("ano").type)
+    colunas["mes"] = pa.array(data_consulta.dt.month, type=esquema_particoes.field("mes").type)
+    return pa.Table.from_pydict(colunas, schema=esquema_completo)
+
+
+def gravar_historico(df_resultados: pd.DataFrame, caminho: str = CAMINHO_HISTORICO) -> int:
+    """
+    Acrescenta os resultados de uma execução ao histórico em Parquet.
+
+    Parâmetros:
+        df_resultados (pd.DataFrame): Resultados como retornados por limpar_e_tratar_dados.
+        caminho (str): Pasta do histórico.
+
+    Retorna:
+        int: Quantidade de registros gravados (0 se não houver resultados, o pyarrow não estiver instalado
+        ou a gravação falhar).
+    """
+    if df_resultados is None or df_resultados.empty:
+        return 0
+    try:
+        import pyarrow.dataset as ds
+    except ImportError:
+        print("pyarrow não instalado: o histórico em Parquet não foi gravado.")
+        return 0
+
+    df_resultados = df_resultados[df_resultados['data_consulta_api'].notna()]
+    try:
+        tabela = _tabela(df_resultados)
+        _, esquema_particoes, _ = _esquemas()
+
+        # Nome único por gravação: execuções e workers simultâneos nunca sobrescrevem arquivos uns dos outros
+        prefixo = f"execucao-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        ds.write_dataset(
+            tabela, caminho, format="parquet",
+            partitioning=ds.partitioning(esquema_particoes, flavor="hive"),
+            basename_template=f"{prefixo}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+    except Exception as e:
+        # O histórico é uma cópia: o erro não pode refazer nem interromper as consultas já gravadas no banco
+        print(f"Erro ao gravar o histórico em Parquet em {caminho}: {e}")
+        return 0
+    print(f"{tabela.num_rows} registros gravados no histórico em: {caminho}")
+    return tabela.num_rows
+
+
+def ler_historico(colunas: list = None, inicio: date = None, fim: date = None, cnpjs: list = None,
+                  caminho: str = CAMINHO_HISTORICO) -> pd.DataFrame:
+    """
+    Lê o histórico de consultas, carregando só as colunas e as partições necessárias.
+
+    Os filtros de período eliminam as pastas de ano/mês fora do intervalo antes de qualquer
+    leitura, e os demais são aplicados dentro dos arquivos Parquet (predicate pushdown).
+
+    Parâmetros:
+        colunas (list): Colunas do DataFrame (padrão: todas, inclusive 'ano' e 'mes').
+        inicio (date): Primeira data de consulta (data_consulta_api) incluída.
+        fim (date): Última data de consulta incluída.
+        cnpjs (list): Restringe a estes CNPJs (com ou sem pontuação).
+        caminho (str): Pasta do histórico.
+
+    Retorna:
+        pd.DataFrame: Registros do histórico (vazio se o histórico não existir).
+    """
+    import pyarrow.dataset as ds
+
+    if not os.path.isdir(caminho):
+        return pd.DataFrame(columns=colunas)
+
+    _, esquema_particoes, esquema_completo = _esquemas()
+    dataset = ds.dataset(
+        caminho, format="parquet", schema=esquema_completo,
+        partitioning=ds.partitioning(esquema_particoes, flavor="hive"),
+    )
+
+    filtro = None
+    if inicio:
+        inicio = pd.Timestamp(inicio).date()
+        filtro = _e(filtro, (ds.field("ano") > inicio.year)
+                    | ((ds.field("ano") == inicio.year) & (ds.field("mes") >= inicio.month)))
+        filtro = _e(filtro, ds.field("data_consulta_api") >= inicio)
+    if fim:
+        fim = pd.Timestamp(fim).date()
+        filtro = _e(filtro, (ds.field("ano") < fim.year)
+                    | ((ds.field("ano") == fim.year) & (ds.field("mes") <= fim.month)))
+        filtro = _e(filtro, ds.field("data_consulta_api") <= fim)
+    if cnpjs:
+        filtro = _e(filtro, ds.field("normalizado_cnpj").isin([normalizar_cnpj(cnpj) for cnpj in cnpjs]))
+
+    tabela = dataset.to_table(columns=colunas, filter=filtro)
+    df = tabela.to_pandas()
+    for campo, tipo in ((campo, tipo) for campo, _, tipo in ESQUEMA_DF_CONSULTACND if campo in df):
+        if tipo == 'data':
+            df[campo] = pd.to_datetime(df[campo]).astype("datetime64[ns]")
+    return df
+
+
+def _e(filtro, condicao):
+    # Combina as condições do filtro com "e"
+    return condicao if filtro is None else filtro & condicao
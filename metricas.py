@@ -0,0 +1,134 @@
+import json
+import os
+import statistics
+import threading
+import time
+
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+
+def _resumo(valores: list) -> dict:
+    """Estatísticas de uma lista de durações, em segundos."""
+    if not valores:
+        return {"quantidade": 0}
+    ordenados = sorted(valores)
+    return {
+        "quantidade": len(ordenados),
+        "total_s": round(sum(ordenados), 4),
+        "media_s": round(statistics.fmean(ordenados), 4),
+        "p50_s": round(ordenados[int(0.50 * (len(ordenados) - 1))], 4),
+        "p95_s": round(ordenados[int(0.95 * (len(ordenados) - 1))], 4),
+        "max_s": round(ordenados[-1], 4),
+    }
+
+
+def _escrever_atomico(caminho: str, conteudo: str):
+    """Grava o arquivo por meio de um temporário, para que leitores nunca vejam um arquivo pela metade."""
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    temporario = f"{caminho}.tmp"
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        arquivo.write(conteudo)
+    os.replace(temporario, caminho)
+
+
+class ColetorMetricas():
+    """
+    Coleta tempos por etapa e por CNPJ, bytes de PDF e contagem de respostas da Infosimples.
+
+    Etapas usadas na consulta: 'api' (rotulada pela preferência de emissão), 'pdf',
+    'limpeza' e 'gravacao_db'. É seguro para uso a partir de várias threads.
+    """
+
+    def __init__(self):
+        self.inicio = datetime.now()
+        self._inicio_monotonico = time.perf_counter()
+        self._lock = threading.Lock()
+        self._duracoes = defaultdict(list)  # (etapa, rótulo) -> [segundos]
+        self._por_cnpj = defaultdict(dict)  # cnpj -> {etapa: segundos}
+        self._respostas = Counter()  # código da Infosimples (ou tipo de falha) -> quantidade
+        self._bytes_pdf = 0
+
+    @contextmanager
+    def medir(self, etapa: str, cnpj: str = None, rotulo: str = ""):
+        """Mede a duração do bloco e a registra na etapa (e no CNPJ, se informado)."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar_duracao(etapa, time.perf_counter() - inicio, cnpj, rotulo)
+
+    def registrar_duracao(self, etapa: str, duracao: float, cnpj: str = None, rotulo: str = ""):
+        with self._lock:
+            self._duracoes[(etapa, rotulo)].append(duracao)
+            if cnpj:
+                chave = f"{etapa}_{rotulo}" if rotulo else etapa
+                self._por_cnpj[cnpj][chave] = round(self._por_cnpj[cnpj].get(chave, 0) + duracao, 4)
+
+    def registrar_resposta(self, codigo):
+        with self._lock:
+            self._respostas[str(codigo)] += 1
+
+    def registrar_bytes_pdf(self, quantidade: int):
+        with self._lock:
+            self._bytes_pdf += quantidade
+
+    def gerar_relatorio(self) -> dict:
+        """Monta o relatório da execução com os resumos por etapa, respostas e tempos por CNPJ."""
+        with self._lock:
+            etapas = {}
+            for (etapa, rotulo), duracoes in sorted(self._duracoes.items()):
+                etapas[f"{etapa}[{rotulo}]" if rotulo else etapa] = _resumo(duracoes)
+            return {
+                "inicio": self.inicio.isoformat(),
+                "duracao_total_s": round(time.perf_counter() - self._inicio_monotonico, 3),
+                "etapas": etapas,
+                "respostas_por_codigo": dict(self._respostas),
+                "bytes_pdf": self._bytes_pdf,
+                "por_cnpj": dict(self._por_cnpj),
+            }
+
+    def salvar_json(self, caminho: str):
+        """Grava o relatório da execução em JSON."""
+        _escrever_atomico(caminho, json.dumps(self.gerar_relatorio(), ensure_ascii=False, indent=2))
+        print(f"Relatório da execução salvo em: {caminho}")
+
+    def salvar_prometheus(self, caminho: str):
+        """
+        Grava as métricas no formato texto do Prometheus, para o textfile collector do node exporter.
+
+        O arquivo deve ter extensão .prom e ficar na pasta configurada no node exporter.
+        """
+        linhas = [
+            "# HELP consultacnd_etapa_segundos Tempo gasto em cada etapa da consulta.",
+            "# TYPE consultacnd_etapa_segundos summary",
+        ]
+        with self._lock:
+            for (etapa, rotulo), duracoes in sorted(self._duracoes.items()):
+                rotulos = f'etapa="{etapa}",rotulo="{rotulo}"'
+                ordenados = sorted(duracoes)
+                for quantil in (0.5, 0.95):
+                    valor = ordenados[int(quantil * (len(ordenados) - 1))]
+                    linhas.append(f'consultacnd_etapa_segundos{{{rotulos},quantile="{quantil}"}} {valor:.6f}')
+                linhas.append(f"consultacnd_etapa_segundos_sum{{{rotulos}}} {sum(ordenados):.6f}")
+                linhas.append(f"consultacnd_etapa_segundos_count{{{rotulos}}} {len(ordenados)}")
+
+            linhas += [
+                "# HELP consultacnd_respostas_total Respostas da Infosimples por código.",
+                "# TYPE consultacnd_respostas_total counter",
+            ]
+            linhas += [f'consultacnd_respostas_total{{codigo="{codigo}"}} {quantidade}'
+                       for codigo, quantidade in sorted(self._respostas.items())]
+            linhas += [
+                "# HELP consultacnd_pdf_bytes_total Bytes de PDF baixados.",
+                "# TYPE consultacnd_pdf_bytes_total counter",
+                f"consultacnd_pdf_bytes_total {self._bytes_pdf}",
+                "# HELP consultacnd_ultima_execucao_timestamp_segundos Início da última execução.",
+                "# TYPE consultacnd_ultima_execucao_timestamp_segundos gauge",
+                f"consultacnd_ultima_execucao_timestamp_segundos {self.inicio.timestamp():.0f}",
+            ]
+
+        _escrever_atomico(caminho, "\n".join(linhas) + "\n")
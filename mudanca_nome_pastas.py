@@ -1,92 +1,220 @@
+import csv
 import os
-import pandas as pd
 import re
-import streamlit as st
+import threading
 from datetime import datetime
-from arquivo import ler_planilhas_e_extrair_cnpjs, localizar_arquivo_excel
-
-# Caminho onde estão as pastas dos CNPJs
-ano_atual = datetime.now().year
-#pasta_destino = fr"G:\Drives compartilhados\Operacional\12 - CONTROLES\CND\{ano_atual}"
-pasta_destino = fr'G:\Drives compartilhados\Operacional\12 - CONTROLES\CND\2024'
-
-# Carregar as duas abas da planilha (ajuste o nome das abas conforme necessário)
-arquivo_caminho = r"G:\Drives compartilhados\Operacional\19 - AUTOMAÇAO\RPA\TIME INTERNO AUTOMAÇÃO\PLANILHA AVANTSEC"
-arquivo_excel = localizar_arquivo_excel(arquivo_caminho)
-df_aba1 = pd.read_excel(arquivo_excel, sheet_name=0, header=2)  # Primeira aba
-df_aba2 = pd.read_excel(arquivo_excel, sheet_name=1, header=1)  # Segunda aba
-
-# Verificar e ajustar as colunas 'CNPJ' e 'Empresa' / 'EMPRESA'
-colunas_aba1 = df_aba1.columns.str.strip()
-colunas_aba2 = df_aba2.columns.str.strip()
-
-# Verifique se as colunas 'CNPJ' e 'Empresa' ou 'EMPRESA' existem nas duas abas
-if 'CNPJ' not in colunas_aba1 or ('Empresa' not in colunas_aba1 and 'EMPRESA' not in colunas_aba1):
-    raise KeyError("Colunas 'CNPJ' ou 'Empresa'/'EMPRESA' não encontradas na primeira aba.")
-if 'CNPJ' not in colunas_aba2 or ('Empresa' not in colunas_aba2 and 'EMPRESA' not in colunas_aba2):
-    raise KeyError("Colunas 'CNPJ' ou 'Empresa'/'EMPRESA' não encontradas na segunda aba.")
-
-# Selecionar apenas as colunas 'CNPJ' e a coluna de empresa correspondente
-df_aba1 = df_aba1[['CNPJ', 'Empresa' if 'Empresa' in colunas_aba1 else 'EMPRESA']]  # Ajuste conforme o nome exato
-df_aba2 = df_aba2[['CNPJ', 'Empresa' if 'Empresa' in colunas_aba2 else 'EMPRESA']]  # Ajuste conforme o nome exato
-
-# Limpar os valores de CNPJ e garantir que sejam strings, removendo qualquer '.0'
-df_aba1['CNPJ'] = df_aba1['CNPJ'].dropna().apply(lambda x: str(x).split('.')[0].zfill(14))  # Garantir que tenha 14 dígitos
-df_aba2['CNPJ'] = df_aba2['CNPJ'].dropna().apply(lambda x: str(x).split('.')[0].zfill(14))  # Garantir que tenha 14 dígitos
-
-df_aba1 = df_aba1.dropna(subset=['CNPJ', 'EMPRESA']).reset_index(drop=True)
-df_aba2 = df_aba2.dropna(subset=['CNPJ', 'EMPRESA']).reset_index(drop=True)
-
-# Concatenar as duas planilhas
-df_empresas = pd.concat([df_aba1, df_aba2], ignore_index=True)
-df_empresas.columns = df_empresas.columns.str.strip().dropna().tolist()
-
-# Mostrar o dataframe no Streamlit
-st.dataframe(df_empresas)
-
-# Função para renomear a pasta
-def renomear_pasta(cnpj_pasta, nome_empresa):
-    # Normalizar o nome da empresa, removendo caracteres inválidos
-    nome_empresa_normalizado = re.sub(r'[<>:"/\\|?*]', '', nome_empresa).strip()  # Remove espaços extras no final
-    
-    # Verificar se o nome da pasta é muito longo (Windows tem um limite de 260 caracteres)
-    caminho_pasta_base = os.path.join(pasta_destino, nome_empresa_normalizado)
-    if len(caminho_pasta_base) > 255:  # Aproxima-se do limite do Windows
-        nome_empresa_normalizado = nome_empresa_normalizado[:255]  # Limitar o nome da pasta a 255 caracteres
-    
-    # Verificar se a pasta com o nome da empresa já existe
-    nova_pasta_path = os.path.join(pasta_destino, nome_empresa_normalizado)
-    
-    if os.path.exists(nova_pasta_path):
-        # Se a pasta já existir, gerar um novo nome único
-        i = 1
-        while os.path.exists(f"{nova_pasta_path}_{i}"):
+from arquivo import ler_planilhas_e_extrair_cnpjs, localizar_arquivo_excel, extrair_cnpj
+from executor import executar_em_paralelo
+
+# Pasta com as planilhas semanais de controle (origem dos nomes das empresas)
+PASTA_PLANILHAS_AVANTSEC = r"G:\Drives compartilhados\Operacional\19 - AUTOMAÇAO\RPA\TIME INTERNO AUTOMAÇÃO\PLANILHA AVANTSEC"
+
+
+def pasta_cnds(ano: int) -> str:
+    """Pasta onde estão as pastas dos CNPJs do ano."""
+    return fr'G:\Drives compartilhados\Operacional\12 - CONTROLES\CND\{ano}'
+
+
+# Renomeações simultâneas no drive compartilhado e registro das renomeações feitas (para desfazer)
+MAX_RENOMEACOES_SIMULTANEAS = 4
+NOME_MANIFESTO_RENOMEACOES = "renomeacoes_pastas.csv"
+CAMPOS_MANIFESTO_RENOMEACOES = ["execucao", "origem", "destino"]
+LIMITE_NOME_PASTA = 255  # Aproxima-se do limite do Windows
+
+
+def normalizar_nome_empresa(nome_empresa: str, pasta_destino: str) -> str:
+    """Nome de pasta para a empresa: sem caracteres inválidos no Windows e dentro do limite de tamanho."""
+    nome_empresa_normalizado = re.sub(r'[<>:"/\\|?*]', '', str(nome_empresa)).strip()  # Remove espaços extras no final
+    if len(os.path.join(pasta_destino, nome_empresa_normalizado)) > LIMITE_NOME_PASTA:
+        nome_empresa_normalizado = nome_empresa_normalizado[:LIMITE_NOME_PASTA]
+    return nome_empresa_normalizado
+
+
+def planejar_renomeacoes(pasta_destino: str, df_empresas) -> tuple:
+    """
+    Monta o plano completo de renomeação sem tocar no disco além de uma listagem da pasta.
+
+    A pasta é lida uma única vez (os.scandir) e os nomes das empresas ficam em um dicionário
+    CNPJ → empresa. Colisões (nome já existente ou repetido no próprio plano) são resolvidas
+    em memória com os sufixos "_1", "_2"...; a comparação ignora maiúsculas, como o Windows.
+
+    Parâmetros:
+        pasta_destino (str): Pasta com as pastas dos CNPJs.
+        df_empresas (pd.DataFrame): Colunas 'CNPJ' e 'EMPRESA'.
+
+    Retorna:
+        tuple: (plano, sem_empresa), com o plano como lista de (pasta atual, novo nome) e
+        as pastas cujo CNPJ não está na planilha.
+    """
+    # Primeira ocorrência de cada CNPJ, como na busca linha a linha anterior
+    empresas = {}
+    for cnpj, empresa in zip(df_empresas['CNPJ'], df_empresas['EMPRESA']):
+        empresas.setdefault(cnpj, empresa)
+
+    with os.scandir(pasta_destino) as entradas:
+        entradas = [(entrada.name, entrada.is_dir()) for entrada in entradas]
+    ocupados = {nome.lower() for nome, _ in entradas}
+
+    plano = []
+    sem_empresa = []
+    for pasta, eh_pasta in sorted(entradas):
+        if not eh_pasta:
+            continue
+        cnpj_pasta = extrair_cnpj(pasta)  # CNPJ contido no nome da pasta, normalizado
+        nome_empresa = empresas.get(cnpj_pasta)
+        if nome_empresa is None:
+            sem_empresa.append(pasta)
+            continue
+
+        base = normalizar_nome_empresa(nome_empresa, pasta_destino)
+        novo_nome = base
+        i = 0
+        while novo_nome.lower() in ocupados:
             i += 1
-        nova_pasta_path = f"{nova_pasta_path}_{i}"
-    
-    # Renomear a pasta
-    os.rename(cnpj_pasta, nova_pasta_path)
-    return nova_pasta_path
-
-# Iterar sobre as pastas existentes
-for pasta in os.listdir(pasta_destino):
-    pasta_path = os.path.join(pasta_destino, pasta)
-    
-    # Verificar se a pasta é um diretório e contém um CNPJ no nome
-    if os.path.isdir(pasta_path):
-        cnpj_pasta = re.sub(r'[^\d]', '', pasta)  # Normaliza o CNPJ do nome da pasta
-
-        # Verificar se o CNPJ da pasta existe no DataFrame
-        empresa = df_empresas[df_empresas['CNPJ'] == cnpj_pasta]['EMPRESA'].values
-
-        if empresa.size > 0:
-            nome_empresa = empresa[0]  # Pega o nome da empresa correspondente
-            
-            # Renomear a pasta
+            novo_nome = f"{base}_{i}"
+        # Os nomes atuais continuam reservados: as renomeações rodam em paralelo, sem ordem garantida
+        ocupados.add(novo_nome.lower())
+        plano.append((pasta, novo_nome))
+    return plano, sem_empresa
+
+
+def executar_plano(pasta_destino: str, plano: list, max_renomeacoes: int = MAX_RENOMEACOES_SIMULTANEAS,
+                   exibir=print) -> tuple:
+    """
+    Executa as renomeações do plano em paralelo, registrando cada uma no manifesto da pasta.
+
+    Retorna:
+        tuple: (renomeadas, falhas), listas de (pasta atual, novo nome).
+    """
+    execucao = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    caminho_manifesto = os.path.join(pasta_destino, NOME_MANIFESTO_RENOMEACOES)
+    lock = threading.Lock()
+
+    with open(caminho_manifesto, "a", newline="", encoding="utf-8") as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=CAMPOS_MANIFESTO_RENOMEACOES)
+        if arquivo.tell() == 0:
+            escritor.writeheader()
+
+        def renomear(pasta, novo_nome):
             try:
-                nova_pasta_path = renomear_pasta(pasta_path, nome_empresa)
-                st.write(f"Pasta {pasta} renomeada para {os.path.basename(nova_pasta_path)}")
+                os.rename(os.path.join(pasta_destino, pasta), os.path.join(pasta_destino, novo_nome))
             except OSError as e:
-                st.write(f"Erro ao renomear a pasta {pasta}: {str(e)}")
+                return pasta, novo_nome, str(e)
+            # Registrada assim que feita: uma interrupção no meio não impede desfazer o que já mudou
+            with lock:
+                escritor.writerow({"execucao": execucao, "origem": pasta, "destino": novo_nome})
+                arquivo.flush()
+            return pasta, novo_nome, None
+
+        resultados, _ = executar_em_paralelo(renomear, plano, max_workers=max_renomeacoes)
+
+    # Mensagens exibidas pela thread chamadora (o Streamlit não aceita escrita a partir das threads do pool)
+    renomeadas, falhas = [], []
+    for pasta, novo_nome, erro in resultados:
+        if erro:
+            exibir(f"Erro ao renomear a pasta {pasta}: {erro}")
+            falhas.append((pasta, novo_nome))
         else:
-            st.write(f"CNPJ {cnpj_pasta} não encontrado no DataFrame. A pasta {pasta} não será renomeada.")
+            exibir(f"Pasta {pasta} renomeada para {novo_nome}")
+            renomeadas.append((pasta, novo_nome))
+    return renomeadas, falhas
+
+
+def desfazer_renomeacoes(pasta_destino: str, max_renomeacoes: int = MAX_RENOMEACOES_SIMULTANEAS,
+                         exibir=print) -> int:
+    """
+    Desfaz a última execução registrada no manifesto da pasta, devolvendo os nomes anteriores.
+
+    Retorna:
+        int: Quantidade de pastas restauradas.
+    """
+    caminho_manifesto = os.path.join(pasta_destino, NOME_MANIFESTO_RENOMEACOES)
+    if not os.path.exists(caminho_manifesto):
+        exibir("Nenhuma renomeação registrada nesta pasta.")
+        return 0
+    with open(caminho_manifesto, newline="", encoding="utf-8") as arquivo:
+        linhas = list(csv.DictReader(arquivo))
+    if not linhas:
+        exibir("Nenhuma renomeação registrada nesta pasta.")
+        return 0
+
+    ultima = linhas[-1]["execucao"]
+    desfazer = [(linha["destino"], linha["origem"]) for linha in linhas if linha["execucao"] == ultima]
+
+    def restaurar(nome_atual, nome_anterior):
+        try:
+            os.rename(os.path.join(pasta_destino, nome_atual), os.path.join(pasta_destino, nome_anterior))
+        except OSError as e:
+            return nome_atual, nome_anterior, str(e)
+        return nome_atual, nome_anterior, None
+
+    resultados, _ = executar_em_paralelo(restaurar, desfazer, max_workers=max_renomeacoes)
+    restauradas = set()
+    for nome_atual, nome_anterior, erro in resultados:
+        if erro:
+            exibir(f"Erro ao restaurar a pasta {nome_atual}: {erro}")
+        else:
+            exibir(f"Pasta {nome_atual} restaurada para {nome_anterior}")
+            restauradas.add((nome_atual, nome_anterior))
+
+    # Mantém no manifesto só as renomeações que continuam valendo (inclusive as que não puderam ser desfeitas)
+    with open(caminho_manifesto, "w", newline="", encoding="utf-8") as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=CAMPOS_MANIFESTO_RENOMEACOES)
+        escritor.writeheader()
+        escritor.writerows(linha for linha in linhas
+                           if linha["execucao"] != ultima or (linha["destino"], linha["origem"]) not in restauradas)
+    exibir(f"{len(restauradas)} pastas restauradas da execução {ultima} ({len(desfazer) - len(restauradas)} com erro).")
+    return len(restauradas)
+
+
+def renomear_pastas(pasta_destino, df_empresas, exibir=print, simular: bool = False,
+                    max_renomeacoes: int = MAX_RENOMEACOES_SIMULTANEAS) -> list:
+    """
+    Renomeia as pastas nomeadas pelo CNPJ para o nome da empresa na planilha de controle.
+
+    Parâmetros:
+        pasta_destino (str): Pasta com as pastas dos CNPJs.
+        df_empresas (pd.DataFrame): Colunas 'CNPJ' e 'EMPRESA'.
+        exibir (callable): Onde mostrar o andamento (padrão: print; st.write no Streamlit).
+        simular (bool): Apenas mostra o plano, sem renomear nada.
+        max_renomeacoes (int): Renomeações simultâneas.
+
+    Retorna:
+        list: O plano de renomeação, como pares (pasta atual, novo nome).
+    """
+    plano, sem_empresa = planejar_renomeacoes(pasta_destino, df_empresas)
+    for pasta in sem_empresa:
+        cnpj_pasta = extrair_cnpj(pasta)
+        if cnpj_pasta is None:
+            exibir(f"Nenhum CNPJ no nome da pasta {pasta}. A pasta não será renomeada.")
+        else:
+            exibir(f"CNPJ {cnpj_pasta} não encontrado no DataFrame. A pasta {pasta} não será renomeada.")
+
+    if simular:
+        for pasta, novo_nome in plano:
+            exibir(f"[simulação] {pasta} -> {novo_nome}")
+        exibir(f"{len(plano)} pastas seriam renomeadas.")
+        return plano
+
+    renomeadas, falhas = executar_plano(pasta_destino, plano, max_renomeacoes, exibir)
+    exibir(f"{len(renomeadas)} pastas renomeadas ({len(falhas)} com erro). "
+           f"Para desfazer: consultacnd renomear-pastas --desfazer")
+    return plano
+
+
+# Executado com "streamlit run mudanca_nome_pastas.py"; o Streamlit só é importado aqui
+if __name__ == '__main__':
+    import streamlit as st
+
+    # Caminho onde estão as pastas dos CNPJs
+    ano_atual = datetime.now().year
+    #pasta_destino = pasta_cnds(ano_atual)
+    pasta_destino = pasta_cnds(2024)
+
+    # Carregar as duas abas da planilha (usa o cache local quando a planilha não mudou)
+    arquivo_excel = localizar_arquivo_excel(PASTA_PLANILHAS_AVANTSEC)
+    df_empresas = ler_planilhas_e_extrair_cnpjs(arquivo_excel, sheet1_header=2, sheet2_header=1)
+
+    # Mostrar o dataframe no Streamlit
+    st.dataframe(df_empresas)
+    renomear_pastas(pasta_destino, df_empresas, exibir=st.write)
@@ -0,0 +1,155 @@
+import queue
+import threading
+
+# Marcador de fim de fluxo enviado de um estágio para o seguinte
+_FIM = object()
+
+
+class PipelineConsulta():
+    """
+    Pipeline em estágios: consulta à API → download do PDF → gravação em lotes.
+
+    Os estágios são ligados por filas limitadas e cada um tem o seu próprio número
+    de workers, de modo que um host de PDFs lento não trava as consultas à API
+    (até o limite da fila) e os resultados são gravados à medida que chegam.
+
+    Parâmetros:
+        buscar (callable): `buscar(*tarefa, tentativa=n)` consulta a API e retorna o
+            item para download. Falhas são sinalizadas com exceção ou retorno None.
+        baixar (callable): `baixar(item, tentativa=n)` baixa o PDF e retorna o
+            resultado final (registros do CNPJ). Falhas como em `buscar`.
+        gravar (callable): `gravar(lote)` recebe a lista de resultados do lote.
+            É sempre chamado pela mesma thread.
+        workers_busca (int): Threads do estágio de consulta.
+        workers_download (int): Threads do estágio de download.
+        tamanho_lote (int): Quantidade de resultados por gravação.
+        tamanho_fila (int): Capacidade de cada fila entre estágios.
+        agendador (AgendadorRetentativas): Quando informado, as exceções dos
+            estágios são reagendadas em segundo plano em vez de virarem falha.
+    """
+
+    def __init__(self, buscar, baixar, gravar, workers_busca: int = 8, workers_download: int = 4,
+                 tamanho_lote: int = 50, tamanho_fila: int = 100, agendador=None):
+        self.buscar = buscar
+        self.baixar = baixar
+        self.gravar = gravar
+        self.workers_busca = workers_busca
+        self.workers_download = workers_download
+        self.tamanho_lote = tamanho_lote
+        self.tamanho_fila = tamanho_fila
+        self.agendador = agendador
+        self.falhas = []
+        # Tarefas que ainda não chegaram à gravação nem falharam em definitivo
+        self._em_andamento = 0
+        self._condicao = threading.Condition()
+
+    def _concluir(self, tarefa=None, falhou: bool = False):
+        with self._condicao:
+            if falhou:
+                self.falhas.append(tarefa)
+            self._em_andamento -= 1
+            self._condicao.notify_all()
+
+    def _aguardar_em_andamento(self):
+        # Tarefas reservadas para a varredura final não serão executadas antes dela
+        with self._condicao:
+            while self._em_andamento > (self.agendador.reservadas_varredura() if self.agendador else 0):
+                self._condicao.wait()
+
+    def _executar_etapa(self, funcao, entrada: queue.Queue, saida: queue.Queue, desempacotar: bool, final: bool):
+        def reenfileirar(tarefa, tentativa):
+            entrada.put((tarefa, tentativa))
+
+        while True:
+            registro = entrada.get()
+            if registro is _FIM:
+                return
+            tarefa, tentativa = registro
+            try:
+                resultado = funcao(*tarefa, tentativa=tentativa) if desempacotar else funcao(tarefa, tentativa=tentativa)
+            except Exception as e:
+                if self.agendador is not None and self.agendador.agendar(tarefa, tentativa, e, reenfileirar):
+                    with self._condicao:
+                        self._condicao.notify_all()
+                    continue  # Continua em andamento: será executada novamente mais tarde
+                if self.agendador is None:
+                    print(f"Erro no pipeline para {tarefa}: {e}")
+                resultado = None
+
+            if resultado is None:
+                self._concluir(tarefa, falhou=True)
+            elif final:
+                # Último estágio antes da gravação: a tarefa deixa de estar em andamento
+                saida.put(resultado)
+                self._concluir()
+            else:
+                saida.put((resultado, 0))
+
+    def _gravar_lotes(self, entrada: queue.Queue):
+        lote = []
+        while True:
+            registro = entrada.get()
+            if registro is _FIM:
+                break
+            lote.append(registro)
+            if len(lote) >= self.tamanho_lote:
+                self._gravar(lote)
+                lote = []
+        if lote:
+            self._gravar(lote)
+
+    def _gravar(self, lote):
+        try:
+            self.gravar(lote)
+        except Exception as e:
+            print(f"Erro ao gravar lote de {len(lote)} resultados: {e}")
+
+    def executar(self, tarefas) -> list:
+        """
+        Processa as tarefas e aguarda o término de todos os estágios, incluindo
+        as retentativas agendadas e a varredura final.
+
+        Retorna:
+            list: Tarefas ou itens que falharam em definitivo em algum estágio.
+        """
+        fila_busca = queue.Queue(self.tamanho_fila)
+        fila_download = queue.Queue(self.tamanho_fila)
+        fila_gravacao = queue.Queue(self.tamanho_fila)
+
+        threads_busca = [
+            threading.Thread(target=self._executar_etapa, args=(self.buscar, fila_busca, fila_download, True, False), daemon=True)
+            for _ in range(self.workers_busca)
+        ]
+        threads_download = [
+            threading.Thread(target=self._executar_etapa, args=(self.baixar, fila_download, fila_gravacao, False, True), daemon=True)
+            for _ in range(self.workers_download)
+        ]
+        thread_gravacao = threading.Thread(target=self._gravar_lotes, args=(fila_gravacao,), daemon=True)
+
+        if self.agendador is not None:
+            self.agendador.iniciar()
+        for thread in threads_busca + threads_download + [thread_gravacao]:
+            thread.start()
+
+        for tarefa in tarefas:
+            with self._condicao:
+                self._em_andamento += 1
+            fila_busca.put((tuple(tarefa), 0))
+
+        # Aguarda as tarefas novas e as retentativas; depois, uma última passada nas que esgotaram as tentativas
+        self._aguardar_em_andamento()
+        if self.agendador is not None:
+            if self.agendador.varredura_final():
+                self._aguardar_em_andamento()
+            self.agendador.parar()
+
+        # Encerra os estágios em ordem, um marcador de fim por worker
+        for fila, threads in ((fila_busca, threads_busca), (fila_download, threads_download)):
+            for _ in threads:
+                fila.put(_FIM)
+            for thread in threads:
+                thread.join()
+        fila_gravacao.put(_FIM)
+        thread_gravacao.join()
+
+        return self.falhas
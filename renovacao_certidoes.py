@@ -0,0 +1,192 @@
+import argparse
+import heapq
+import time
+import pandas as pd
+
+from datetime import datetime, timedelta
+
+from arquivo import ler_planilhas_e_extrair_cnpjs, localizar_arquivo_excel
+from controller import dbController
+from cota_api import GovernadorCota
+from cache_certidoes import validade_efetiva
+from metricas import ColetorMetricas
+from executar_consulta import (
+    CAMINHO_PROMETHEUS, PASTA_PLANILHAS_AVANTSEC,
+    criar_consulta, consultar_cnpjs, pasta_destino_pdfs,
+)
+
+# Renovações: quantas consultas por hora e com quantos dias de antecedência ao vencimento
+RENOVACOES_POR_HORA = 60
+DIAS_ANTECEDENCIA_RENOVACAO = 20
+INTERVALO_MINUTOS = 5  # Cada ciclo consome a cota proporcional ao intervalo
+ATRASO_FALHA_HORAS = 6  # Espera mínima antes de consultar de novo um CNPJ que falhou ou não renovou
+RECARREGAR_PLANILHA_HORAS = 24
+
+
+class FilaRenovacoes():
+    """
+    Fila de prioridade dos CNPJs da carteira, ordenada pela data de renovação.
+
+    A data de renovação é a validade da última certidão (a maior entre DATA_VALIDADE e
+    DATA_VALIDADE_PRORROGADA) menos os dias de antecedência; CNPJs sem certidão no banco
+    vencem imediatamente. Cada CNPJ tem uma única entrada válida: reagendar substitui a
+    anterior (as entradas antigas do heap são descartadas ao sair).
+
+    Parâmetros:
+        dias_antecedencia (int): Dias antes do vencimento em que a certidão é renovada.
+    """
+
+    def __init__(self, dias_antecedencia: int = DIAS_ANTECEDENCIA_RENOVACAO):
+        self.dias_antecedencia = dias_antecedencia
+        self._heap = []  # (data de renovação, cnpj)
+        self._agendados = {}  # cnpj -> (data de renovação, empresa)
+
+    def __len__(self):
+        return len(self._agendados)
+
+    def agendar(self, cnpj: str, empresa: str, quando: datetime):
+        self._agendados[cnpj] = (quando, empresa)
+        heapq.heappush(self._heap, (quando, cnpj))
+
+    def data_renovacao(self, validade, agora: datetime) -> datetime:
+        if pd.isna(validade):
+            return agora
+        return pd.Timestamp(validade).to_pydatetime() - timedelta(days=self.dias_antecedencia)
+
+    def carregar(self, df_cnpjs: pd.DataFrame, df_certidoes: pd.DataFrame, agora: datetime):
+        """
+        Sincroniza a fila com a carteira: inclui os CNPJs novos e retira os que saíram.
+
+        CNPJs que já estavam na fila mantêm a data agendada, o que preserva os adiamentos
+        após falhas.
+        """
+        validades = {}
+        if df_certidoes is not None and not df_certidoes.empty:
+            validades = dict(zip(df_certidoes['cod_cnpj_normalizado'].astype(str), validade_efetiva(df_certidoes)))
+
+        carteira = dict(zip(df_cnpjs['CNPJ'], df_cnpjs['EMPRESA']))
+        for cnpj in set(self._agendados) - set(carteira):
+            del self._agendados[cnpj]
+        novos = 0
+        for cnpj, empresa in carteira.items():
+            if cnpj not in self._agendados:
+                self.agendar(cnpj, empresa, self.data_renovacao(validades.get(cnpj), agora))
+                novos += 1
+
+        # Reconstrói o heap sem as entradas descartadas
+        self._heap = [(quando, cnpj) for cnpj, (quando, _) in self._agendados.items()]
+        heapq.heapify(self._heap)
+        print(f"Fila de renovações: {len(self)} CNPJs ({novos} novos), "
+              f"{sum(1 for quando, _ in self._heap if quando <= agora)} vencidos para renovação.")
+
+    def proximos(self, quantidade: int, agora: datetime) -> list:
+        """Retira da fila até `quantidade` CNPJs cuja data de renovação já chegou, os mais urgentes primeiro."""
+        lote = []
+        while self._heap and len(lote) < quantidade and self._heap[0][0] <= agora:
+            quando, cnpj = heapq.heappop(self._heap)
+            agendado = self._agendados.get(cnpj)
+            if agendado is None or agendado[0] != quando:
+                continue  # Entrada substituída por um reagendamento ou CNPJ retirado da carteira
+            del self._agendados[cnpj]
+            lote.append((cnpj, agendado[1]))
+        return lote
+
+    def proxima_data(self):
+        while self._heap:
+            quando, cnpj = self._heap[0]
+            agendado = self._agendados.get(cnpj)
+            if agendado is not None and agendado[0] == quando:
+                return quando
+            heapq.heappop(self._heap)
+        return None
+
+
+def executar_renovacoes(por_hora: int = RENOVACOES_POR_HORA, dias_antecedencia: int = DIAS_ANTECEDENCIA_RENOVACAO,
+                        intervalo_minutos: float = INTERVALO_MINUTOS, ciclos: int = None):
+    """
+    Renova as certidões continuamente, em pequenos lotes, conforme o vencimento.
+
+    A cada ciclo são consultados no máximo `por_hora * intervalo_minutos / 60` CNPJs cuja
+    data de renovação já chegou, de modo que a carga fica distribuída ao longo do tempo em
+    vez de concentrada na execução de segunda-feira. A carteira é relida da planilha de
+    controle mais recente uma vez por dia.
+
+    Parâmetros:
+        por_hora (int): Consultas por hora.
+        dias_antecedencia (int): Dias antes do vencimento em que cada certidão é renovada.
+        intervalo_minutos (float): Intervalo entre os ciclos.
+        ciclos (int): Quantidade de ciclos a executar (padrão: sem fim).
+    """
+    control = dbController()
+    fila = FilaRenovacoes(dias_antecedencia)
+    cota = max(1, round(por_hora * intervalo_minutos / 60))
+    proxima_recarga = datetime.min
+    ciclo = 0
+
+    while ciclos is None or ciclo < ciclos:
+        inicio = time.monotonic()
+        agora = datetime.now()
+
+        if agora >= proxima_recarga:
+            try:
+                df_carteira = ler_planilhas_e_extrair_cnpjs(localizar_arquivo_excel(PASTA_PLANILHAS_AVANTSEC))
+                if len(df_carteira):
+                    fila.carregar(df_carteira, control.ler_ultimas_certidoes(df_carteira['CNPJ'].tolist()), agora)
+                proxima_recarga = agora + timedelta(hours=RECARREGAR_PLANILHA_HORAS)
+            except Exception as e:
+                # Sem a planilha a fila continua com a carteira anterior; nova tentativa no próximo ciclo
+                print(f"Erro ao recarregar a carteira da planilha de controle: {e}")
+
+        lote = fila.proximos(cota, agora)
+        if lote:
+            try:
+                metricas = ColetorMetricas()
+                # Cota compartilhada com as demais execuções; esgotada, o lote fica para um ciclo seguinte
+                governador = GovernadorCota(control, execucao=f"renovacao-{agora.strftime('%Y-%m-%d_%H-%M')}")
+                consulta = criar_consulta(pasta_destino_pdfs(agora.year), agora, metricas, governador=governador)
+                try:
+                    falhas = set(consultar_cnpjs(consulta, control, pd.DataFrame(lote, columns=['CNPJ', 'EMPRESA'])))
+                finally:
+                    governador.fechar()
+
+                # Reagenda pela nova validade; falhas e certidões que continuam perto do vencimento esperam um pouco
+                df_certidoes = control.ler_ultimas_certidoes([cnpj for cnpj, _ in lote])
+                validades = {}
+                if df_certidoes is not None and not df_certidoes.empty:
+                    validades = dict(zip(df_certidoes['cod_cnpj_normalizado'].astype(str),
+                                         validade_efetiva(df_certidoes)))
+                espera_minima = datetime.now() + timedelta(hours=ATRASO_FALHA_HORAS)
+                for cnpj, empresa in lote:
+                    quando = espera_minima if cnpj in falhas else fila.data_renovacao(validades.get(cnpj), agora)
+                    fila.agendar(cnpj, empresa, max(quando, espera_minima))
+
+                print(f"Renovações: {len(lote) - len(falhas) - len(governador.interrompidos)} renovadas, "
+                      f"{len(falhas)} com falha, {len(governador.interrompidos)} sem cota; "
+                      f"{len(fila)} CNPJs na fila, próxima renovação em {fila.proxima_data()}.")
+                metricas.salvar_prometheus(CAMINHO_PROMETHEUS)
+            except Exception as e:
+                # O lote já saiu da fila: volta inteiro após a espera mínima para não perder nenhum CNPJ
+                print(f"Erro no ciclo de renovação: {e}")
+                espera_minima = datetime.now() + timedelta(hours=ATRASO_FALHA_HORAS)
+                for cnpj, empresa in lote:
+                    fila.agendar(cnpj, empresa, espera_minima)
+
+        ciclo += 1
+        if ciclos is None or ciclo < ciclos:
+            time.sleep(max(0, intervalo_minutos * 60 - (time.monotonic() - inicio)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Renova as certidões de CND continuamente, conforme o vencimento.")
+    parser.add_argument("--por-hora", type=int, default=RENOVACOES_POR_HORA, help="Consultas por hora.")
+    parser.add_argument("--dias-antecedencia", type=int, default=DIAS_ANTECEDENCIA_RENOVACAO,
+                        help="Dias antes do vencimento em que a certidão é renovada.")
+    parser.add_argument("--intervalo-minutos", type=float, default=INTERVALO_MINUTOS, help="Intervalo entre os ciclos.")
+    parser.add_argument("--ciclos", type=int, help="Quantidade de ciclos (padrão: sem fim).")
+    opcoes = parser.parse_args()
+
+    executar_renovacoes(opcoes.por_hora, opcoes.dias_antecedencia, opcoes.intervalo_minutos, opcoes.ciclos)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import csv
+import os
+import shutil
+import threading
+import uuid
+
+# Repositório local (fora do drive compartilhado) com uma única cópia de cada PDF, indexada pelo SHA-256
+CAMINHO_REPOSITORIO_PDFS = os.path.join(os.path.expanduser("~"), ".consultacnd", "pdfs")
+
+# Manifesto de cada pasta de empresa: nome do PDF da consulta → arquivo físico com o mesmo conteúdo
+NOME_MANIFESTO = "manifesto_pdfs.csv"
+CAMPOS_MANIFESTO = ["nome_arquivo", "hash_pdf", "arquivo_fisico"]
+
+
+class RepositorioPDFs():
+    """
+    Armazena os PDFs das certidões uma única vez, pelo hash do conteúdo.
+
+    O PDF é baixado na pasta temporária do repositório (o BaixadorPDFs calcula o SHA-256
+    durante o download) e movido para o objeto do seu hash. Na pasta da empresa, a
+    primeira certidão com um determinado conteúdo vira um hardlink para o objeto do
+    repositório (ou uma cópia, quando a pasta está em outro disco, como o drive
+    compartilhado); as repetidas, comuns na "2via", recebem apenas uma linha no
+    manifesto apontando para o arquivo já existente, sem ocupar espaço nem upload.
+
+    Parâmetros:
+        caminho (str): Pasta do repositório local.
+    """
+
+    def __init__(self, caminho: str = CAMINHO_REPOSITORIO_PDFS):
+        self.caminho = caminho
+        self._pasta_objetos = os.path.join(caminho, "objetos")
+        self._pasta_temporaria = os.path.join(caminho, "tmp")
+        os.makedirs(self._pasta_objetos, exist_ok=True)
+        os.makedirs(self._pasta_temporaria, exist_ok=True)
+        self._lock = threading.Lock()  # Protege só o dicionário de locks das pastas
+        self._locks_pastas = {}  # pasta da empresa -> lock da pasta
+        self._manifestos = {}  # pasta da empresa -> {hash: arquivo físico}
+
+    def caminho_objeto(self, digest: str) -> str:
+        return os.path.join(self._pasta_objetos, digest[:2], f"{digest}.pdf")
+
+    def caminho_temporario(self) -> str:
+        """Caminho novo na pasta temporária do repositório (mesmo disco dos objetos, para renomear sem cópia)."""
+        return os.path.join(self._pasta_temporaria, f"{uuid.uuid4().hex}.pdf")
+
+    def guardar_arquivo(self, caminho: str, hash_pdf: str) -> bool:
+        """
+        Move para o repositório um PDF já baixado e validado, cujo hash foi calculado no download.
+
+        Retorna:
+            bool: Se o conteúdo já existia (nesse caso o arquivo é apenas descartado).
+        """
+        destino = self.caminho_objeto(hash_pdf)
+        if os.path.exists(destino):
+            os.remove(caminho)
+            return True
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        os.replace(caminho, destino)
+        return False
+
+    def _lock_pasta(self, pasta: str) -> threading.Lock:
+        with self._lock:
+            return self._locks_pastas.setdefault(pasta, threading.Lock())
+
+    def _manifesto(self, pasta: str) -> dict:
+        # Chamado com o lock da pasta adquirido; lê o manifesto da pasta uma única vez por execução
+        if pasta not in self._manifestos:
+            arquivos = {}
+            caminho = os.path.join(pasta, NOME_MANIFESTO)
+            if os.path.exists(caminho):
+                with open(caminho, newline="", encoding="utf-8") as arquivo:
+                    for linha in csv.DictReader(arquivo):
+                        fisico = os.path.join(pasta, linha["arquivo_fisico"])
+                        if os.path.exists(fisico):
+                            arquivos.setdefault(linha["hash_pdf"], linha["arquivo_fisico"])
+            self._manifestos[pasta] = arquivos
+        return self._manifestos[pasta]
+
+    def publicar(self, hash_pdf: str, destino: str) -> str:
+        """
+        Disponibiliza o objeto do repositório em `destino` (pasta da empresa).
+
+        Retorna:
+            str: Caminho do arquivo físico com o conteúdo: o próprio `destino` ou
+            um PDF idêntico já existente na mesma pasta.
+        """
+        pasta, nome = os.path.split(destino)
+        # Um lock por pasta de empresa: cópias para empresas diferentes no drive seguem em paralelo,
+        # e duas threads nunca copiam o mesmo conteúdo para a mesma pasta
+        with self._lock_pasta(pasta):
+            arquivos = self._manifesto(pasta)
+            fisico = arquivos.get(hash_pdf)
+            if fisico is None:
+                objeto = self.caminho_objeto(hash_pdf)
+                try:
+                    os.link(objeto, destino)
+                except OSError:
+                    # Outro disco ou sistema de arquivos sem hardlink: cópia única por pasta
+                    temporario = f"{destino}.part"
+                    shutil.copyfile(objeto, temporario)
+                    with open(temporario, "rb+") as arquivo:
+                        os.fsync(arquivo.fileno())
+                    os.replace(temporario, destino)
+                fisico = arquivos[hash_pdf] = nome
+
+            caminho_manifesto = os.path.join(pasta, NOME_MANIFESTO)
+            novo = not os.path.exists(caminho_manifesto)
+            with open(caminho_manifesto, "a", newline="", encoding="utf-8") as arquivo:
+                escritor = csv.DictWriter(arquivo, fieldnames=CAMPOS_MANIFESTO)
+                if novo:
+                    escritor.writeheader()
+                escritor.writerow({"nome_arquivo": nome, "hash_pdf": hash_pdf, "arquivo_fisico": fisico})
+
+        return os.path.join(pasta, fisico)
@@ -1,74 +1,193 @@
-import psycopg2
-from psycopg2 import sql
+from banco import conexao, transacao, url_banco
+
+# Esquema da tabela df_consultacnd, na ordem do CREATE TABLE:
+# (coluna do DataFrame - campo da Infosimples ou coluna calculada, coluna da tabela, tipo)
+# Tipos: 'texto' (VARCHAR/CHAR), 'data' (DATE) e 'numero' (NUMERIC)
+ESQUEMA_DF_CONSULTACND = [
+    ('certidao', 'NOME_CERTIDAO', 'texto'),
+    ('certidao_codigo', 'COD_CERTIDAO', 'texto'),
+    ('cnpj', 'COD_CNPJ', 'texto'),
+    ('cnpj_situacao', 'COD_CNPJ_STATUS', 'texto'),
+    ('comprovante_tipo', 'TIPO_COMPROVANTE', 'texto'),
+    ('conseguiu_emitir_certidao_negativa', 'STATUS_EMISSAO_CERTIDAO_NEGATIVA', 'texto'),
+    ('consulta_comprovante', 'COD_COMPROVANTE', 'texto'),
+    ('consulta_datahora', 'DATA_CONSULTA', 'data'),
+    ('debitos_pgfn', 'STATUS_DEBITOS_PGFN', 'texto'),
+    ('debitos_rfb', 'STATUS_DEBITOS_RFB', 'texto'),
+    ('emissao_data', 'DATA_EMISSAO', 'data'),
+    ('mensagem', 'MENSAGEM', 'texto'),
+    ('nome', 'NOME_CLIENTE', 'texto'),
+    ('normalizado_cnpj', 'COD_CNPJ_NORMALIZADO', 'texto'),
+    ('normalizado_emissao_datahora', 'DATA_EMISSAO_COMPLETA', 'data'),
+    ('razao_social', 'RAZAO_SOCIAL', 'texto'),
+    ('situacao', 'STATUS_CERTIDAO', 'texto'),
+    ('tipo', 'TIPO_CERTIDAO', 'texto'),
+    ('validade', 'DATA_VALIDADE', 'data'),
+    ('validade_prorrogada', 'DATA_VALIDADE_PRORROGADA', 'data'),
+    ('site_receipt', 'SITE_RESPOSTA', 'texto'),
+    ('code', 'COD_RESPOSTA', 'numero'),
+    ('code_message', 'MENSAGEM_RESPOSTA', 'texto'),
+    ('data_consulta_api', 'DATA_CONSULTA_API', 'data'),
+    ('cod_certidao', 'COD_CERTIDAO_NORMALIZADO', 'texto'),
+    ('caminho_pdf', 'CAMINHO_DRIVE_PDF', 'texto'),
+    ('hash_pdf', 'HASH_PDF', 'texto'),
+]
+
+# Colunas da tabela e mapeamento das colunas do DataFrame para a tabela, derivados do esquema
+COLUNAS_DF_CONSULTACND = [coluna for _, coluna, _ in ESQUEMA_DF_CONSULTACND]
+MAPA_COLUNAS_DF_CONSULTACND = {campo: coluna for campo, coluna, _ in ESQUEMA_DF_CONSULTACND}
+TIPOS_DF_CONSULTACND = {campo: tipo for campo, _, tipo in ESQUEMA_DF_CONSULTACND}
+
+CREATE_TABLE_DF_CONSULTACND = '''
+    CREATE TABLE IF NOT EXISTS df_consultacnd (
+        NOME_CERTIDAO VARCHAR(2000),
+        COD_CERTIDAO VARCHAR(100),
+        COD_CNPJ VARCHAR(100), 
+        COD_CNPJ_STATUS VARCHAR(100),
+        TIPO_COMPROVANTE VARCHAR(100),
+        STATUS_EMISSAO_CERTIDAO_NEGATIVA VARCHAR(100),
+        COD_COMPROVANTE VARCHAR(100),
+        DATA_CONSULTA DATE NOT NULL,
+        STATUS_DEBITOS_PGFN VARCHAR(100),
+        STATUS_DEBITOS_RFB VARCHAR(100),
+        DATA_EMISSAO DATE NOT NULL,
+        MENSAGEM VARCHAR(2000),
+        NOME_CLIENTE VARCHAR(1000),
+        COD_CNPJ_NORMALIZADO VARCHAR(100),
+        DATA_EMISSAO_COMPLETA DATE NOT NULL,
+        RAZAO_SOCIAL VARCHAR(1000),
+        STATUS_CERTIDAO VARCHAR(1000),
+        TIPO_CERTIDAO VARCHAR(1000),
+        DATA_VALIDADE DATE NOT NULL,
+        DATA_VALIDADE_PRORROGADA DATE NOT NULL,
+        SITE_RESPOSTA VARCHAR(2000),
+        COD_RESPOSTA NUMERIC,
+        MENSAGEM_RESPOSTA VARCHAR(2000),
+        DATA_CONSULTA_API DATE NOT NULL,
+        COD_CERTIDAO_NORMALIZADO VARCHAR(100),
+        CAMINHO_DRIVE_PDF VARCHAR(2000),
+        HASH_PDF CHAR(64)
+        )
+'''
+
+# Alterações em tabelas já existentes (idempotentes)
+ALTER_TABLE_DF_CONSULTACND = '''
+    ALTER TABLE df_consultacnd ADD COLUMN IF NOT EXISTS HASH_PDF CHAR(64);
+'''
+
+# Índices do visualizador: filtro por razão social (ILIKE via trigram) e leitura da última certidão por CNPJ
+CREATE_INDICES_DF_CONSULTACND = '''
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    CREATE INDEX IF NOT EXISTS idx_df_consultacnd_razao_social_trgm
+        ON df_consultacnd USING GIN (RAZAO_SOCIAL gin_trgm_ops);
+    CREATE INDEX IF NOT EXISTS idx_df_consultacnd_cnpj_data_consulta
+        ON df_consultacnd (COD_CNPJ_NORMALIZADO, DATA_CONSULTA_API DESC);
+    CREATE INDEX IF NOT EXISTS idx_df_consultacnd_data_consulta
+        ON df_consultacnd (DATA_CONSULTA_API DESC);
+    CREATE INDEX IF NOT EXISTS idx_df_consultacnd_hash_pdf
+        ON df_consultacnd (HASH_PDF);
+'''
+
+# Execuções do lote e resultado de cada CNPJ, usados pelo modo delta para comparar com a última execução concluída
+CREATE_TABLE_EXECUCOES_CONSULTA = '''
+    CREATE TABLE IF NOT EXISTS execucoes_consulta (
+        ID_EXECUCAO SERIAL PRIMARY KEY,
+        PLANILHA VARCHAR(1000),
+        DATA_INICIO TIMESTAMP NOT NULL,
+        DATA_FIM TIMESTAMP,
+        STATUS VARCHAR(20) NOT NULL
+        );
+    CREATE TABLE IF NOT EXISTS execucoes_consulta_cnpjs (
+        ID_EXECUCAO INTEGER NOT NULL REFERENCES execucoes_consulta (ID_EXECUCAO) ON DELETE CASCADE,
+        COD_CNPJ_NORMALIZADO VARCHAR(100) NOT NULL,
+        RESULTADO VARCHAR(20) NOT NULL,
+        PRIMARY KEY (ID_EXECUCAO, COD_CNPJ_NORMALIZADO)
+        );
+'''
+
+# Fila de consultas distribuída entre processos/máquinas: cada worker reserva tarefas com
+# SELECT ... FOR UPDATE SKIP LOCKED e mantém um prazo (lease) que expira se ele morrer
+CREATE_TABLE_FILA_CONSULTAS = '''
+    CREATE TABLE IF NOT EXISTS fila_consultas (
+        ID_TAREFA BIGSERIAL PRIMARY KEY,
+        COD_CNPJ_NORMALIZADO VARCHAR(100) NOT NULL,
+        NOME_EMPRESA VARCHAR(1000) NOT NULL,
+        STATUS VARCHAR(20) NOT NULL DEFAULT 'pendente',
+        TENTATIVAS INTEGER NOT NULL DEFAULT 0,
+        WORKER VARCHAR(200),
+        LEASE_ATE TIMESTAMP,
+        DISPONIVEL_EM TIMESTAMP NOT NULL DEFAULT now(),
+        CRIADO_EM TIMESTAMP NOT NULL DEFAULT now(),
+        ATUALIZADO_EM TIMESTAMP NOT NULL DEFAULT now()
+        );
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_fila_consultas_cnpj_aberto
+        ON fila_consultas (COD_CNPJ_NORMALIZADO) WHERE STATUS IN ('pendente', 'em_execucao');
+    CREATE INDEX IF NOT EXISTS idx_fila_consultas_disponivel
+        ON fila_consultas (DISPONIVEL_EM, ID_TAREFA) WHERE STATUS = 'pendente';
+    CREATE INDEX IF NOT EXISTS idx_fila_consultas_lease
+        ON fila_consultas (LEASE_ATE) WHERE STATUS = 'em_execucao';
+'''
+
+# Cota da API compartilhada por todos os processos: balde de fichas (taxa) e consultas do dia/mês,
+# e consumo por execução e código de resposta (custo estimado)
+CREATE_TABLE_COTA_API = '''
+    CREATE TABLE IF NOT EXISTS cota_api (
+        NOME VARCHAR(100) PRIMARY KEY,
+        FICHAS DOUBLE PRECISION NOT NULL,
+        ATUALIZADO_EM TIMESTAMP NOT NULL DEFAULT clock_timestamp(),
+        DIA DATE NOT NULL DEFAULT current_date,
+        CONSULTAS_DIA INTEGER NOT NULL DEFAULT 0,
+        CONSULTAS_MES INTEGER NOT NULL DEFAULT 0
+        );
+    CREATE TABLE IF NOT EXISTS consumo_api (
+        DIA DATE NOT NULL,
+        EXECUCAO VARCHAR(200) NOT NULL,
+        CODIGO VARCHAR(20) NOT NULL,
+        QUANTIDADE INTEGER NOT NULL DEFAULT 0,
+        CUSTO NUMERIC(12, 2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (DIA, EXECUCAO, CODIGO)
+        );
+'''
 
 class serviceTaxAllDB():
+    """
+    Criação do banco e das tabelas pelas engines compartilhadas de banco.py.
+
+    As conexões só são abertas quando um comando é executado e voltam ao pool ao final.
+    """
 
-    def __init__(self):
-        self.conn = psycopg2.connect(
-            dbname="master",
-            user="postgres",
-            password="djgr27041965",
-            host="localhost",
-            port="5432"
-            )
+    def __init__(self, banco_administracao="master"):
+        self.url_administracao = url_banco(banco_administracao)
 
     def creating_DB(self, dataset_compensacao):
-        self.conn.autocommit = True 
-        cur = self.conn.cursor()
+        import psycopg2
+        from psycopg2 import sql
+        from sqlalchemy.exc import DBAPIError
+
         db_name = dataset_compensacao
-        try:
-            cur.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(db_name)))
-            print(f"Banco de dados '{db_name}' criado com sucesso!")
-        except psycopg2.errors.DuplicateDatabase:
-            print(f"O banco de dados '{db_name}' já existe.")
-        finally:
-            cur.close()
+        # CREATE DATABASE não pode rodar dentro de uma transação
+        with conexao(self.url_administracao, autocommit=True) as conn:
+            try:
+                conn.exec_driver_sql(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(db_name)).as_string(conn.connection.dbapi_connection))
+                print(f"Banco de dados '{db_name}' criado com sucesso!")
+            except DBAPIError as e:
+                if not isinstance(e.orig, psycopg2.errors.DuplicateDatabase):
+                    raise
+                print(f"O banco de dados '{db_name}' já existe.")
 
     def creatingTables(self, db, formatoDaTabela:str):
-            conn = psycopg2.connect(
-                dbname=f"{db}",
-                user="postgres",
-                password="djgr27041965",
-                host="localhost",
-                port="5432"
-            )
-            cur = conn.cursor()
-            cur.execute(formatoDaTabela)
-            conn.commit()
-            cur.close()
-            conn.close()
+        with transacao(url_banco(db)) as conn:
+            conn.exec_driver_sql(formatoDaTabela)
 
-if __name__ == '__main__':
+def inicializar_banco(nome_banco='db_consultacnd'):
+    """Cria o banco (se necessário), as tabelas, as alterações pendentes e os índices."""
     service = serviceTaxAllDB()
-    service.creating_DB('db_consultacnd')
-    create_table_query_df_consultacnd = '''
-        CREATE TABLE IF NOT EXISTS df_consultacnd (
-            NOME_CERTIDAO VARCHAR(2000),
-            COD_CERTIDAO VARCHAR(100),
-            COD_CNPJ VARCHAR(100), 
-            COD_CNPJ_STATUS VARCHAR(100),
-            TIPO_COMPROVANTE VARCHAR(100),
-            STATUS_EMISSAO_CERTIDAO_NEGATIVA VARCHAR(100),
-            COD_COMPROVANTE VARCHAR(100),
-            DATA_CONSULTA DATE NOT NULL,
-            STATUS_DEBITOS_PGFN VARCHAR(100),
-            STATUS_DEBITOS_RFB VARCHAR(100),
-            DATA_EMISSAO DATE NOT NULL,
-            MENSAGEM VARCHAR(2000),
-            NOME_CLIENTE VARCHAR(1000),
-            COD_CNPJ_NORMALIZADO VARCHAR(100),
-            DATA_EMISSAO_COMPLETA DATE NOT NULL,
-            RAZAO_SOCIAL VARCHAR(1000),
-            STATUS_CERTIDAO VARCHAR(1000),
-            TIPO_CERTIDAO VARCHAR(1000),
-            DATA_VALIDADE DATE NOT NULL,
-            DATA_VALIDADE_PRORROGADA DATE NOT NULL,
-            SITE_RESPOSTA VARCHAR(2000),
-            COD_RESPOSTA NUMERIC,
-            MENSAGEM_RESPOSTA VARCHAR(2000),
-            DATA_CONSULTA_API DATE NOT NULL,
-            COD_CERTIDAO_NORMALIZADO VARCHAR(100),
-            CAMINHO_DRIVE_PDF VARCHAR(2000)
-            )
-    '''
-    service.creatingTables('db_consultacnd', create_table_query_df_consultacnd)
\ No newline at end of file
+    service.creating_DB(nome_banco)
+    for comando in (CREATE_TABLE_DF_CONSULTACND, ALTER_TABLE_DF_CONSULTACND, CREATE_INDICES_DF_CONSULTACND,
+                    CREATE_TABLE_EXECUCOES_CONSULTA, CREATE_TABLE_FILA_CONSULTAS, CREATE_TABLE_COTA_API):
+        service.creatingTables(nome_banco, comando)
+    print(f"Banco de dados '{nome_banco}' inicializado.")
+
+
+if __name__ == '__main__':
+    inicializar_banco()